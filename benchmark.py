@@ -0,0 +1,240 @@
+import os
+import sys
+import copy
+import json
+import time
+import random
+import platform
+import argparse
+import subprocess
+import tracemalloc
+import contextlib
+import neat
+import numpy as np
+from game import Game, ENGINE_INTERVAL_MS, check_collision_circle_rectangle
+
+
+DEFAULT_POPULATION_SIZES = [20, 200, 2000, 20000]
+# modules imported by CLI subcommands and worker processes at startup
+DEFAULT_IMPORT_MODULES = ["cli", "network", "policy", "replay", "telemetry", "game", "benchmark"]
+GUI_MODULES = ("tkinter", "PIL")
+
+
+def create_genomes(config, size, seed = 0, mutations = 5):
+    # random genomes (with a few mutations, so networks have some hidden nodes) - same for given seed
+    random.seed(seed)
+    genomes = []
+    for genome_id in range(size):
+        genome = config.genome_type(genome_id)
+        genome.configure_new(config.genome_config)
+        for i in range(mutations):
+            genome.mutate(config.genome_config)
+        genomes.append((genome_id, genome))
+    return genomes
+
+
+class GameSnapshot():
+    # Birds die within a few dozens of ticks, so the population is restored before every measured sample
+    # to keep its size constant. Pillars are restored as well, so every sample sees the same pillar positions.
+
+    def __init__(self, game):
+        self.birds = copy.deepcopy(game.birds)
+        self.networks = copy.deepcopy(game.networks)
+        self.genome_instances = list(game.genome_instances)
+        self.pillars = [(list(pillar.center_position), copy.deepcopy(pillar.heights)) for pillar in game.pillar_instances]
+        self.track = (game.track.first, game.track.active)
+
+    def restore(self, game):
+        game.birds = copy.deepcopy(self.birds)
+        game.networks = copy.deepcopy(self.networks)
+        game.genome_instances = list(self.genome_instances)
+        for pillar, (center_position, heights) in zip(game.pillar_instances, self.pillars):
+            pillar.center_position[:] = center_position
+            pillar.set_height(heights)
+        game.track.first, game.track.active = self.track
+        game.game_running = True
+
+
+def measure(game, snapshot, function, repeat, track_allocations):
+    """
+    Measures duration (and optionally memory allocated) of a function call on game state.
+
+    Arguments:
+    game: Game
+        Game the function works with
+    snapshot: GameSnapshot
+        State of population restored before each call (not measured)
+    function: callable
+        Function called without arguments
+    repeat: int
+        Number of measured calls
+    track_allocations: bool
+        Measure allocated memory (tracemalloc must be running) instead of duration
+
+    Returns:
+        dict: calls per second, latency percentiles in microseconds and allocated bytes per call
+    """
+
+    durations = np.zeros(repeat)
+    allocated = np.zeros(repeat)
+
+    for i in range(repeat):
+        snapshot.restore(game)
+
+        if track_allocations:
+            tracemalloc.reset_peak()
+            memory_before = tracemalloc.get_traced_memory()[0]
+            function()
+            allocated[i] = tracemalloc.get_traced_memory()[1] - memory_before
+        else:
+            start = time.perf_counter()
+            function()
+            durations[i] = time.perf_counter() - start
+
+    if track_allocations:
+        return {"alloc_peak_bytes_mean": float(allocated.mean()),
+                "alloc_peak_bytes_max": float(allocated.max())}
+
+    latency_us = durations * 1e6
+    return {"calls_per_sec": float(repeat / durations.sum()),
+            "latency_us": {"mean": float(latency_us.mean()),
+                           "p50": float(np.percentile(latency_us, 50)),
+                           "p90": float(np.percentile(latency_us, 90)),
+                           "p99": float(np.percentile(latency_us, 99)),
+                           "max": float(latency_us.max())}}
+
+
+def benchmark_population(config, population_size, repeat, seed):
+    genomes = create_genomes(config, population_size, seed)
+
+    build_start = time.perf_counter()
+    game = Game(ENGINE_INTERVAL_MS, genomes, config, seed=seed)
+    build_time = time.perf_counter() - build_start
+
+    snapshot = GameSnapshot(game)
+    # collision benchmarks need a pillar overlapping the birds, otherwise they only measure the early exit
+    game.track.scroll(game.track.active_pillar().center_position[0] - game.params.bird_x)
+    collision_snapshot = GameSnapshot(game)
+    snapshot.restore(game)
+    pillar = game.pillar_instances[0]
+
+    def collision_circle_rectangle():
+        check_collision_circle_rectangle([0.5, game.birds.bird_y], game.params.bird_diameter_rel,
+                                         [pillar.center_position[0] - game.params.pillar_dimensions[0] / 2, pillar.bottom_head_inner_y],
+                                         game.params.pillar_dimensions)
+
+    # name -> (function, state restored before each sample)
+    benchmarks = {
+        "tick": (game.tick, snapshot),
+        "check_for_collisions": (game.check_for_collisions, collision_snapshot),
+        "pillar_collision": (lambda: game.track.active_pillar().check_for_bird_collision(game.birds.bird_y), collision_snapshot),
+        "physics_update_all_birds": (game.physics_update_all_birds, snapshot),
+        "make_AI_decision": (game.make_AI_decision, snapshot),
+        "order_pillars": (game.order_pillars, snapshot),
+        "check_collision_circle_rectangle": (collision_circle_rectangle, collision_snapshot),
+    }
+
+    results = []
+    for name, (function, snapshot) in benchmarks.items():
+        snapshot.restore(game)
+        bird_x = game.params.bird_x
+        result = {"benchmark": name, "population": population_size, "repeat": repeat,
+                  "active_pillar_x": game.track.active_pillar().center_position[0],
+                  "pillars_at_bird": len(game.track.pillars_in_band(bird_x - game.params.bird_diameter_rel, bird_x + game.params.bird_diameter_rel))}
+        result.update(measure(game, snapshot, function, repeat, track_allocations=False))
+
+        # allocations are measured in separate pass, as tracing slows down the measured code
+        tracemalloc.start()
+        result.update(measure(game, snapshot, function, max(1, repeat // 10), track_allocations=True))
+        tracemalloc.stop()
+
+        results.append(result)
+
+    results.append({"benchmark": "game_setup", "population": population_size, "seconds": build_time})
+    return results
+
+
+def benchmark_import(module, repeat):
+    """
+    Measures import of module in fresh interpreter (as paid by every CLI command and spawned worker process).
+
+    Arguments:
+    module: str
+        Name of module next to this file
+    repeat: int
+        Number of measured interpreters
+
+    Returns:
+        dict: import time of the module (reported by -X importtime), time of the whole process in milliseconds,
+        number of loaded modules and whether GUI modules (tkinter, PIL) were loaded
+    """
+
+    import_ms = np.zeros(repeat)
+    process_ms = np.zeros(repeat)
+    for i in range(repeat):
+        start = time.perf_counter()
+        completed = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                                   cwd=os.path.dirname(os.path.abspath(__file__)), capture_output=True, text=True, check=True)
+        process_ms[i] = (time.perf_counter() - start) * 1e3
+
+        # lines "import time: self [us] | cumulative [us] | module" (nested modules are indented)
+        loaded = []
+        for line in completed.stderr.splitlines():
+            if line.startswith("import time:") and "|" in line and not line.endswith("imported package"):
+                self_us, cumulative_us, name = line[len("import time:"):].split("|")
+                loaded.append(name.strip())
+                if name.strip() == module:
+                    import_ms[i] = int(cumulative_us) / 1e3
+
+    return {"benchmark": "import", "module": module, "repeat": repeat,
+            "import_ms": {"min": float(import_ms.min()), "p50": float(np.percentile(import_ms, 50))},
+            "process_ms": {"min": float(process_ms.min()), "p50": float(np.percentile(process_ms, 50))},
+            "modules_loaded": len(loaded),
+            "loads_gui": any(name.split(".")[0] in GUI_MODULES for name in loaded)}
+
+
+def run_benchmarks(config_path, population_sizes, repeat, seed, import_modules = DEFAULT_IMPORT_MODULES, import_repeat = 5):
+    config = neat.Config(neat.DefaultGenome, neat.DefaultReproduction,
+                            neat.DefaultSpeciesSet, neat.DefaultStagnation,
+                            config_path)
+
+    results = []
+    if import_repeat > 0:
+        results.extend(benchmark_import(module, import_repeat) for module in import_modules)
+
+    # game prints a summary line whenever all birds die (measured ticks can end the game), it would mix with JSON output
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        for population_size in population_sizes:
+            results.extend(benchmark_population(config, population_size, repeat, seed))
+
+    return {"timestamp": time.time(),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "engine_interval_ms": ENGINE_INTERVAL_MS,
+            "results": results}
+
+
+def main(argv = None, prog = None):
+    parser = argparse.ArgumentParser(prog=prog, description="Benchmark of game engine hot paths, results are written as JSON")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_POPULATION_SIZES, help="population sizes to benchmark")
+    parser.add_argument("--repeat", type=int, default=200, help="number of measured calls of each function")
+    parser.add_argument("--seed", type=int, default=0, help="seed of genomes and pillars")
+    parser.add_argument("--output", default=None, help="JSON file with results (printed when not given)")
+    parser.add_argument("--import-modules", nargs="+", default=DEFAULT_IMPORT_MODULES, help="modules whose import time is measured in fresh interpreter")
+    parser.add_argument("--import-repeat", type=int, default=5, help="number of measured imports of each module (0 = don't measure)")
+    args = parser.parse_args(argv)
+
+    config_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "config.txt")
+    report = run_benchmarks(config_path, args.sizes, args.repeat, args.seed, args.import_modules, args.import_repeat)
+
+    if args.output == None:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    else:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
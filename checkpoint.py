@@ -0,0 +1,350 @@
+import os
+import gzip
+import json
+import time
+import pickle
+import random
+import shutil
+from array import array
+from itertools import count
+import neat
+
+
+# Checkpoint directory:
+#   index.json - every checkpointed generation with best/mean fitness (kept even when its file is deleted)
+#   generation_N.ckpt - gzip compressed pickle with state needed to continue training from generation N
+#   run_TIMESTAMP/ - index and snapshots of previous trainings, moved away when a new training starts
+#                    (or when training is resumed from older snapshot than the newest one)
+#
+# Snapshot is either "full" (all genomes) or "delta" - genome is stored as changes against its first
+# parent (or against itself when it survived as elite) from the previous snapshot, as offspring share
+# most genes with parents. Restoring a delta replays the chain from the last full snapshot.
+CHECKPOINT_FORMAT = 1
+INDEX_FILE = "index.json"
+
+
+def gene_values(gene):
+    return tuple(getattr(gene, attribute.name) for attribute in gene._gene_attributes)
+
+
+def genes_delta(genes, parent_genes):
+    # values of genes which are new or differ from parent, and keys of parent genes which are missing
+    changed = {}
+    for key, gene in genes.items():
+        values = gene_values(gene)
+        if key not in parent_genes or values != gene_values(parent_genes[key]):
+            changed[key] = values
+    removed = [key for key in parent_genes if key not in genes]
+    return changed, removed
+
+
+def apply_genes_delta(parent_genes, changed, removed, gene_type):
+    genes = {key: gene.copy() for key, gene in parent_genes.items()}
+    for key in removed:
+        del genes[key]
+    for key, values in changed.items():
+        gene = gene_type(key)
+        for attribute, value in zip(gene_type._gene_attributes, values):
+            setattr(gene, attribute.name, value)
+        genes[key] = gene
+    return genes
+
+
+def pack_random_state(state):
+    # state of Mersenne Twister as raw bytes (pickled tuple of 625 ints is about a third bigger)
+    version, internal_state, gauss_next = state
+    return version, array("I", internal_state).tobytes(), gauss_next
+
+
+def unpack_random_state(packed):
+    version, internal_state, gauss_next = packed
+    return version, tuple(array("I", internal_state)), gauss_next
+
+
+class CheckpointStore(neat.reporting.BaseReporter):
+    """
+    Saves training state into directory after every generation and restores it (replaces neat.Checkpointer).
+
+    Arguments:
+    directory: str
+        Directory for snapshots and index
+    keep_last: int
+        Number of the newest snapshots kept on disk
+    keep_best: int
+        Number of snapshots with the best fitness kept on disk (besides the newest ones)
+    full_every: int
+        Every n-th snapshot stores all genomes, others are deltas against the previous one (1 = no deltas).
+        Weights of most offspring are mutated, so deltas are only a little smaller than full snapshots,
+        and all snapshots a kept delta depends on have to be kept as well.
+    compresslevel: int
+        gzip compression level of snapshots
+    """
+
+    def __init__(self, directory, keep_last = 5, keep_best = 3, full_every = 1, compresslevel = 6):
+        self.directory = directory
+        self.keep_last = keep_last
+        self.keep_best = keep_best
+        self.full_every = max(1, full_every)
+        self.compresslevel = compresslevel
+
+        self.index = self.load_index()
+        self.population = None # neat.Population being saved (see attach)
+        self.previous_generation = None # the last saved snapshot, base of the next delta
+        self.previous_genomes = None
+        self.deltas_since_full = 0
+        self.best_genome = None
+        self.best_fitness = None
+        self.mean_fitness = None
+
+    def path(self, file_name):
+        return os.path.join(self.directory, file_name)
+
+    def load_index(self):
+        if not os.path.exists(self.path(INDEX_FILE)):
+            return []
+        with open(self.path(INDEX_FILE)) as f:
+            return json.load(f)["checkpoints"]
+
+    def write_index(self):
+        temporary_path = self.path(INDEX_FILE + ".tmp")
+        with open(temporary_path, "w") as f:
+            json.dump({"format": CHECKPOINT_FORMAT, "checkpoints": self.index}, f, indent=1)
+        os.replace(temporary_path, self.path(INDEX_FILE))
+
+    def attach(self, population, new_run = True):
+        # store reads ancestors of genomes from reproduction, so it is attached to the population itself,
+        # new training doesn't continue the index of the previous one (see archive)
+        if new_run:
+            self.archive()
+        self.population = population
+        population.add_reporter(self)
+
+    def archive(self, entries = None):
+        # moves index entries (all by default) and their snapshots into subdirectory, so retention and find("best")
+        # only see the current training - snapshots which moved deltas depend on are copied along
+        entries = self.index if entries == None else entries
+        if len(entries) == 0:
+            return
+        name = "run_" + time.strftime("%Y%m%d_%H%M%S")
+        archive_directory = self.path(name)
+        suffix = 1
+        while os.path.exists(archive_directory): # more trainings started within a second
+            archive_directory = self.path(f"{name}_{suffix}")
+            suffix += 1
+        os.makedirs(archive_directory)
+
+        moved = set(entry["generation"] for entry in entries)
+        by_generation = {entry["generation"]: entry for entry in self.index}
+        archived = {entry["generation"]: entry for entry in entries}
+        for entry in entries:
+            if entry["file"] == None:
+                continue
+            os.replace(self.path(entry["file"]), os.path.join(archive_directory, entry["file"]))
+            parent = entry["parent"]
+            while parent != None and parent not in archived:
+                archived[parent] = by_generation[parent]
+                shutil.copy2(self.path(archived[parent]["file"]), os.path.join(archive_directory, archived[parent]["file"]))
+                parent = archived[parent]["parent"]
+
+        with open(os.path.join(archive_directory, INDEX_FILE), "w") as f:
+            json.dump({"format": CHECKPOINT_FORMAT, "checkpoints": sorted(archived.values(), key=lambda entry: entry["generation"])}, f, indent=1)
+        self.index = [entry for entry in self.index if entry["generation"] not in moved]
+        self.write_index()
+        print(f"Checkpoints of generations {min(moved)} to {max(moved)} moved to {archive_directory}")
+
+    # --- neat reporter interface ---
+
+    def post_evaluate(self, config, population, species, best_genome):
+        fitnesses = [genome.fitness for genome in population.values()]
+        self.best_genome = best_genome
+        self.best_fitness = max(fitnesses)
+        self.mean_fitness = sum(fitnesses) / len(fitnesses)
+
+    def end_generation(self, config, population, species_set):
+        # population is already the offspring, training continues with the next generation
+        self.save(self.population.generation + 1, population, species_set)
+
+    # --- saving ---
+
+    def save(self, generation, population, species_set):
+        os.makedirs(self.directory, exist_ok=True)
+
+        full = self.previous_genomes == None or self.deltas_since_full + 1 >= self.full_every
+        snapshot = {"format": CHECKPOINT_FORMAT,
+                    "generation": generation,
+                    "species": self.encode_species(population, species_set),
+                    "random_state": pack_random_state(random.getstate()),
+                    "best_genome": self.best_genome}
+        if full:
+            snapshot["genomes"] = population
+            self.deltas_since_full = 0
+        else:
+            snapshot["genome_deltas"] = self.encode_genomes(population)
+            self.deltas_since_full += 1
+
+        file_name = f"generation_{generation}.ckpt"
+        temporary_path = self.path(file_name + ".tmp")
+        with gzip.open(temporary_path, "wb", compresslevel=self.compresslevel) as f:
+            pickle.dump(snapshot, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temporary_path, self.path(file_name))
+
+        self.index = [entry for entry in self.index if entry["generation"] != generation]
+        self.index.append({"generation": generation,
+                           "file": file_name,
+                           "parent": None if full else self.previous_generation, # snapshot the delta is based on
+                           "best_fitness": self.best_fitness, # of the generation which produced this one
+                           "mean_fitness": self.mean_fitness,
+                           "bytes": os.path.getsize(self.path(file_name))})
+        self.previous_generation = generation
+        self.previous_genomes = dict(population)
+
+        self.apply_retention()
+        self.write_index()
+
+    def encode_genomes(self, population):
+        ancestors = self.population.reproduction.ancestors if self.population != None else {}
+        encoded = []
+        for key, genome in population.items():
+            if key in self.previous_genomes:
+                parent_key = key # elite, same genome as in the previous snapshot
+            else:
+                parent_key = next((parent for parent in ancestors.get(key, ()) if parent in self.previous_genomes), None)
+
+            if parent_key == None:
+                encoded.append((key, None, genome))
+                continue
+            parent = self.previous_genomes[parent_key]
+            nodes = genes_delta(genome.nodes, parent.nodes)
+            connections = genes_delta(genome.connections, parent.connections)
+            encoded.append((key, parent_key, (genome.fitness, nodes, connections)))
+        return encoded
+
+    def encode_species(self, population, species_set):
+        # genomes are referenced by key, so they are not stored twice
+        species = []
+        for s in species_set.species.values():
+            representative = s.representative.key if s.representative.key in population else s.representative
+            species.append({"key": s.key, "created": s.created, "last_improved": s.last_improved,
+                            "representative": representative, "members": list(s.members),
+                            "fitness": s.fitness, "adjusted_fitness": s.adjusted_fitness,
+                            "fitness_history": s.fitness_history})
+        return species
+
+    def apply_retention(self):
+        # snapshots on disk: the newest, the best ones and everything their deltas depend on
+        stored = [entry for entry in self.index if entry["file"] != None]
+        keep = set(entry["generation"] for entry in stored[-self.keep_last:])
+        ranked = sorted((entry for entry in stored if entry["best_fitness"] != None), key=lambda entry: entry["best_fitness"], reverse=True)
+        keep.update(entry["generation"] for entry in ranked[:self.keep_best])
+
+        by_generation = {entry["generation"]: entry for entry in stored}
+        for generation in list(keep):
+            parent = by_generation[generation]["parent"]
+            while parent != None:
+                keep.add(parent)
+                parent = by_generation[parent]["parent"]
+
+        for entry in stored:
+            if entry["generation"] not in keep:
+                os.remove(self.path(entry["file"]))
+                entry["file"] = None
+
+    # --- restoring ---
+
+    def find(self, which = "latest"):
+        # generation of stored snapshot: "latest", "best" or generation number
+        stored = [entry for entry in self.index if entry["file"] != None]
+        if len(stored) == 0:
+            raise ValueError(f"No checkpoints in {self.directory}")
+        if which == "latest":
+            return stored[-1]["generation"]
+        if which == "best":
+            return max(stored, key=lambda entry: -float("inf") if entry["best_fitness"] == None else entry["best_fitness"])["generation"]
+        generation = int(which)
+        if generation not in [entry["generation"] for entry in stored]:
+            raise ValueError(f"Checkpoint of generation {generation} is not stored in {self.directory}")
+        return generation
+
+    def read(self, generation):
+        entry = next(entry for entry in self.index if entry["generation"] == generation)
+        with gzip.open(self.path(entry["file"]), "rb") as f:
+            snapshot = pickle.load(f)
+        if snapshot["format"] != CHECKPOINT_FORMAT:
+            raise ValueError(f"{entry['file']} has unsupported checkpoint format")
+        return entry, snapshot
+
+    def load_genomes(self, generation, config):
+        entry, snapshot = self.read(generation)
+        if entry["parent"] == None:
+            return snapshot["genomes"], snapshot
+        previous_genomes, previous_snapshot = self.load_genomes(entry["parent"], config)
+
+        genomes = {}
+        for key, parent_key, data in snapshot["genome_deltas"]:
+            if parent_key == None:
+                genomes[key] = data
+                continue
+            fitness, (nodes, removed_nodes), (connections, removed_connections) = data
+            parent = previous_genomes[parent_key]
+            genome = config.genome_type(key)
+            genome.fitness = fitness
+            genome.nodes = apply_genes_delta(parent.nodes, nodes, removed_nodes, config.genome_config.node_gene_type)
+            genome.connections = apply_genes_delta(parent.connections, connections, removed_connections, config.genome_config.connection_gene_type)
+            genomes[key] = genome
+        return genomes, snapshot
+
+    def restore(self, config, which = "latest"):
+        """
+        Creates population which continues training from stored snapshot.
+
+        Arguments:
+        config: neat.Config
+            Configuration of NEAT (not stored in snapshots)
+        which: str
+            "latest", "best" (snapshot following the generation with the best fitness) or generation number,
+            snapshots newer than the restored one are moved into run_TIMESTAMP subdirectory
+
+        Returns:
+            neat.Population: population to run, store is attached to it and continues saving snapshots
+        """
+
+        generation = self.find(which)
+        genomes, snapshot = self.load_genomes(generation, config)
+
+        species_set = config.species_set_type(config.species_set_config, None)
+        for data in snapshot["species"]:
+            species = neat.species.Species(data["key"], data["created"])
+            representative = data["representative"] # key, or genome which is not in population
+            species.update(genomes[representative] if isinstance(representative, int) else representative,
+                           {key: genomes[key] for key in data["members"]})
+            species.last_improved = data["last_improved"]
+            species.fitness = data["fitness"]
+            species.adjusted_fitness = data["adjusted_fitness"]
+            species.fitness_history = data["fitness_history"]
+            species_set.species[species.key] = species
+            for key in data["members"]:
+                species_set.genome_to_species[key] = species.key
+
+        population = neat.Population(config, (genomes, species_set, generation))
+        species_set.reporters = population.reporters
+        # indexers are not stored - new genomes and species continue after the existing ones
+        population.reproduction.genome_indexer = count(max(genomes) + 1)
+        species_set.indexer = count(max(species_set.species, default=0) + 1)
+        # otherwise neat seeds it from the first mutated genome and can give another genome a key it already has
+        config.genome_config.node_indexer = count(max(max(genome.nodes) for genome in genomes.values()) + 1)
+        random.setstate(unpack_random_state(snapshot["random_state"]))
+
+        # snapshots newer than the restored one belong to abandoned run (they would be overwritten
+        # by the resumed one), next snapshots are deltas against the restored one
+        self.archive([entry for entry in self.index if entry["generation"] > generation])
+
+        by_generation = {entry["generation"]: entry for entry in self.index}
+        self.previous_generation = generation
+        self.previous_genomes = dict(genomes)
+        self.deltas_since_full = 0
+        parent = by_generation[generation]["parent"]
+        while parent != None:
+            self.deltas_since_full += 1
+            parent = by_generation[parent]["parent"]
+        self.attach(population, new_run=False)
+        return population
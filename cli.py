@@ -0,0 +1,29 @@
+import argparse
+import importlib
+
+
+# subcommand -> (module with main(argv, prog), arguments always passed, description)
+# Module is imported only when its subcommand runs, e.g. serve doesn't load neat, tkinter or PIL.
+COMMANDS = {
+    "train": ("game", ["--headless"], "headless training (arguments of game.py)"),
+    "watch": ("game", [], "training shown in window (arguments of game.py)"),
+    "bench": ("benchmark", [], "benchmark of engine hot paths and import times (arguments of benchmark.py)"),
+    "replay": ("replay", [], "renders recorded replay (arguments of replay.py)"),
+    "serve": ("policy", [], "serves exported policy over local socket (arguments of policy.py)"),
+}
+
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description="Flappy bird AI - " + ", ".join(f"{name}: {description}" for name, (module, fixed, description) in COMMANDS.items()),
+                                     epilog="'python cli.py COMMAND --help' shows arguments of the command")
+    parser.add_argument("command", choices=COMMANDS.keys(), help="what to run")
+    parser.add_argument("arguments", nargs=argparse.REMAINDER, help="arguments of the command")
+    args = parser.parse_args(argv)
+
+    module_name, fixed_arguments, description = COMMANDS[args.command]
+    module = importlib.import_module(module_name)
+    module.main(fixed_arguments + args.arguments, prog=f"{parser.prog} {args.command}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,17 +1,42 @@
 import os
-import tkinter as tk
-from PIL import Image, ImageTk
-from math import ceil, sqrt
-from random import uniform
+from math import ceil
+from random import Random
+from functools import lru_cache
+import argparse
+import multiprocessing
+import time
+import csv
+import heapq
 import neat
 import numpy as np
+from network import PopulationNetwork
+from replay import ReplayRecorder
+from telemetry import TickMetrics, merge_game_stats
+# tkinter and PIL are imported only by App and TkRenderer, so headless games (and their worker processes) don't load them
 
 
+ENGINE_INTERVAL_MS = 17 # physics time step, shared by windowed and headless games
+
+# how many times faster than real time is the game simulated (None = as fast as possible)
+SPEED_OPTIONS = {"1x": 1, "10x": 10, "100x": 100, "max": None}
+
 class App():
     
-    def __init__(self):
+    def __init__(self, speed = "1x", profile_csv_path = None, max_drawn_birds = 200, budget = None, physics = None):
         
         self.game_exists = False
+        self.game_stats = None # statistics of the last finished game (read by TelemetryReporter)
+        self.budget = budget
+        self.physics = physics # overrides of GameParameters
+        self.low_frequency_after = None # pending tkinter callback of low_frequency_loop
+        self.generation = 0
+
+        # time spent in each phase of engine and drawing, dumped to CSV after each generation (when path given)
+        self.profiler = PhaseProfiler()
+        self.profile_csv_path = profile_csv_path
+
+        # with more birds only the best ones are drawn, rest is shown as density strip
+        self.max_drawn_birds = max_drawn_birds
 
         self.ROOT_WIDTH = 800
         self.ROOT_HEIGHT = 700
@@ -25,10 +50,17 @@ class App():
         self.COLOR_APPLE = "#c20000"  # Dark red
 
         self.TIME_DRAW_INTERVAL_MS = 17 # 17 ms ~ 60 fps
-        self.TIME_ENGINE_INTERVAL_MS = 17
+        self.TIME_ENGINE_INTERVAL_MS = ENGINE_INTERVAL_MS
+        self.MAX_SKIPPED_FRAMES = 10 # frame is drawn at least once per this many frames, even when engine is behind
+
+        # fixed timestep - engine ticks are accumulated from real time elapsed between frames
+        self.time_accumulator_ms = 0
+        self.last_frame_time = None
+        self.skipped_frames = 0
 
 
         # tkinter app root window
+        import tkinter as tk
         self.root = tk.Tk()
         self.root.title("Flappy bird AI")
         self.root.resizable(False, False)
@@ -42,9 +74,18 @@ class App():
         self.button_jump = tk.Button(self.root, text="Jump", command=self.jump_first_bird_instance)
         self.button_jump.pack()
 
-        # label showing current score of top 3 birds
-        self.label_score = tk.Label(self.root, text="aaaaaaaa")
-        self.label_score.pack()
+        # speed of simulation (multiple of real time)
+        self.speed = tk.StringVar(self.root, speed)
+        self.option_speed = tk.OptionMenu(self.root, self.speed, *SPEED_OPTIONS.keys())
+        self.option_speed.pack()
+
+        # label showing current score of top 3 birds and next to it overlay with time spent in each phase
+        self.frame_labels = tk.Frame(self.root)
+        self.frame_labels.pack()
+        self.label_score = tk.Label(self.frame_labels, text="aaaaaaaa")
+        self.label_score.pack(side="left")
+        self.label_profile = tk.Label(self.frame_labels, text="", font=("Courier", 8), justify="left")
+        self.label_profile.pack(side="left")
 
         # blank canvas widget
         self.canvas = tk.Canvas(background=self.COLOR_BACKGROUND)
@@ -61,39 +102,89 @@ class App():
 
     def start_engine_loop(self):
         self.button_start["state"] = "disabled"
-        self.engine_loop()
+        self.time_accumulator_ms = 0
+        self.last_frame_time = time.perf_counter()
+        self.frame_loop()
         self.low_frequency_loop()
 
     def jump_first_bird_instance(self):
-        self.game.bird_instances[0].jump()
-
-    def engine_loop(self):
-        self.game.check_for_collisions()
-        self.game.physics_update_all_birds()
-        self.game.physics_move_all_pillars()
-        self.game.order_pillars()
-        self.game.make_AI_decision()
-        self.game.remove_dead_birds()
-        if self.game.game_running:
-            self.root.after(self.TIME_ENGINE_INTERVAL_MS, self.engine_loop)
-        else:
+        self.game.birds.jump_bird(0)
+
+    def frame_loop(self):
+        # One frame = as many engine ticks as the elapsed (sped up) time requires, followed by drawing.
+        # Physics always uses fixed time step, so it does not depend on accuracy of tkinter timers.
+        frame_start = time.perf_counter()
+        elapsed_ms = (frame_start - self.last_frame_time) * 1000
+        self.last_frame_time = frame_start
+
+        self.engine_loop(elapsed_ms, frame_start + self.TIME_DRAW_INTERVAL_MS / 1000)
+
+        if not self.game.game_running:
+            # callback left from this game would keep running in the next one (the game is reused)
+            if self.low_frequency_after != None:
+                self.root.after_cancel(self.low_frequency_after)
+                self.low_frequency_after = None
+            self.game_stats = self.game.stats()
+            if self.profile_csv_path != None:
+                self.profiler.dump_csv(self.profile_csv_path, self.generation)
             self.root.quit()
+            return
+
+        # skip drawing when engine does not keep up with requested speed
+        frame_time_ms = (time.perf_counter() - frame_start) * 1000
+        if frame_time_ms > self.TIME_DRAW_INTERVAL_MS and self.skipped_frames < self.MAX_SKIPPED_FRAMES:
+            self.skipped_frames += 1
+        else:
+            self.skipped_frames = 0
+            self.draw_loop()
+        
+        frame_time_ms = (time.perf_counter() - frame_start) * 1000
+        self.root.after(max(1, int(self.TIME_DRAW_INTERVAL_MS - frame_time_ms)), self.frame_loop)
+
+    def engine_loop(self, elapsed_ms, deadline):
+        speed = SPEED_OPTIONS[self.speed.get()]
+        
+        if speed == None: # max speed - engine runs until it is time to draw next frame
+            while self.game.game_running and time.perf_counter() < deadline:
+                self.profiler.tick(self.game)
+            self.profiler.record_frame(elapsed_ms, None)
+            return
+
+        self.time_accumulator_ms += elapsed_ms * speed
+        # when the engine is too slow for requested speed, time which can't be caught up is dropped
+        self.time_accumulator_ms = min(self.time_accumulator_ms, speed * self.TIME_DRAW_INTERVAL_MS * self.MAX_SKIPPED_FRAMES)
+
+        while self.game.game_running and self.time_accumulator_ms >= self.TIME_ENGINE_INTERVAL_MS:
+            self.profiler.tick(self.game)
+            self.time_accumulator_ms -= self.TIME_ENGINE_INTERVAL_MS
+        self.profiler.record_frame(elapsed_ms, self.TIME_ENGINE_INTERVAL_MS / speed)
     
     def low_frequency_loop(self):
         if self.game_exists:
-            self.game.update_score_label()
+            self.update_score_label()
+            self.label_profile.config(text = self.profiler.overlay_text())
         time_interval = int(self.TIME_ENGINE_INTERVAL_MS / 3)
         if self.game.game_running:
-            self.root.after(time_interval, self.low_frequency_loop)
+            self.low_frequency_after = self.root.after(time_interval, self.low_frequency_loop)
+        else:
+            self.low_frequency_after = None
+
+    def update_score_label(self):
+        top_scores = np.round(np.array(self.game.top_scores(3)), 3)
+        self.label_score.config(text = f"{top_scores}")
 
     def draw_loop(self):
-        self.game.graphics_update_all_birds()
-        self.game.graphics_update_all_pillars()
-        if self.game.game_running:
-            self.root.after(self.TIME_DRAW_INTERVAL_MS, self.draw_loop)
+        self.profiler.measure("drawing", self.renderer.draw)
 
     def start_flappy_bird(self, genomes, config):
-        self.game = Game(self.canvas, self.TIME_ENGINE_INTERVAL_MS, genomes, config, self.label_score)
+        self.generation += 1
+        self.profiler.reset()
+        # the world and its canvas items are created once, following generations only reset it
+        if self.game_exists:
+            self.game.reset(genomes, config)
+        else:
+            self.game = Game(self.TIME_ENGINE_INTERVAL_MS, genomes, config, self.CANVAS_WIDTH, self.CANVAS_HEIGHT, budget=self.budget, physics=self.physics)
+            self.renderer = TkRenderer(self.canvas, self.game, self.max_drawn_birds)
         self.draw_loop()
         self.start_engine_loop()
         self.game_exists = True
@@ -102,373 +193,881 @@ class App():
 
 
 
-class Game():
-    
-    def __init__(self, canvas, ENGINE_INTERVAL_MS, genomes, config, label_score_widget = None):
-        
-        self.game_running = True
+class EvaluationBudget():
+    # Limits of one game, so that a generation can't run forever. When any limit is reached, the game ends
+    # and living birds get their current score as fitness.
 
-        self.label_score_widget = label_score_widget
-        
-        self.pillar_instances = []
+    def __init__(self, max_ticks = None, max_pillars = None, fitness_threshold = None, top_k = None):
+        self.max_ticks = max_ticks
+        self.max_pillars = max_pillars
+        self.fitness_threshold = fitness_threshold # game ends when any bird reaches it
+        self.top_k = top_k # genomes which can't get into top-k are retired early (needs max_ticks and more courses)
+
+
+class CourseEvaluation():
+    # Every genome plays several courses at once - each course is a separate world with its own copy
+    # of all birds, but all worlds are stepped together by one Game. Fitness of genome is aggregated
+    # from its scores in all worlds ("mean", "min" or percentile as "p25").
+
+    def __init__(self, num_courses = 1, aggregation = "mean"):
+        percentile = aggregation.startswith("p") and aggregation[1:].replace(".", "", 1).isdigit()
+        if (aggregation not in ("mean", "min") and not percentile) or (percentile and not 0 <= float(aggregation[1:]) <= 100):
+            raise ValueError(f"Unknown fitness aggregation: {aggregation} (use mean, min or percentile from p0 to p100)")
+        self.num_courses = num_courses
+        self.aggregation = aggregation
+
+    def course_seeds(self, seed):
+        # the first course is given by seed itself, so single course game plays the same pillars as before
+        return [seed] + [Random(f"{seed}/{i}").getrandbits(32) for i in range(1, self.num_courses)]
+
+    def aggregate(self, fitness):
+        # fitness of shape (courses, genomes)
+        if self.aggregation == "mean":
+            return fitness.mean(axis=0)
+        if self.aggregation == "min":
+            return fitness.min(axis=0)
+        return np.percentile(fitness, float(self.aggregation[1:]), axis=0)
+
+
+class PhaseProfiler():
+    # Measures time spent in each phase of engine tick and drawing, and how long real time intervals
+    # between ticks are compared to the target ones. Used to find out what slows down the game.
+
+    PHASES = ["collisions", "physics", "pillars", "ordering", "AI_decision", "dead_birds", "budget", "drawing"]
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.total_s = {phase: 0.0 for phase in self.PHASES}
+        self.max_s = {phase: 0.0 for phase in self.PHASES}
+        self.calls = {phase: 0 for phase in self.PHASES}
+        self.ticks = 0
+        self.frames = 0
+        self.frame_time_ms = 0.0 # real time between frames
+        self.target_tick_interval_ms = None # real time between ticks requested by speed (None = max speed)
+
+    def measure(self, phase, function):
+        start = time.perf_counter()
+        function()
+        duration = time.perf_counter() - start
+        self.total_s[phase] += duration
+        self.calls[phase] += 1
+        if duration > self.max_s[phase]:
+            self.max_s[phase] = duration
+
+    def tick(self, game):
+        # same as game.tick(), but each phase is measured
+        for phase_name, phase in game.tick_phases:
+            self.measure(phase_name, phase)
+        game.notify_observers()
+        self.ticks += 1
+
+    def record_frame(self, elapsed_ms, target_tick_interval_ms):
+        self.frames += 1
+        self.frame_time_ms += elapsed_ms
+        self.target_tick_interval_ms = target_tick_interval_ms
+
+    def mean_ms(self, phase):
+        return 1000 * self.total_s[phase] / self.calls[phase] if self.calls[phase] > 0 else 0.0
+
+    def actual_tick_interval_ms(self):
+        return self.frame_time_ms / self.ticks if self.ticks > 0 else 0.0
+
+    def overlay_text(self):
+        lines = [f"{phase:<12}{self.mean_ms(phase):8.3f} ms" for phase in self.PHASES]
+        target = "max" if self.target_tick_interval_ms == None else f"{self.target_tick_interval_ms:.3f}"
+        lines.append(f"tick every {self.actual_tick_interval_ms():.3f} ms (target {target})")
+        return "\n".join(lines)
+
+    def dump_csv(self, path, generation):
+        # one row per generation, appended to file
+        row = {"generation": generation, "ticks": self.ticks, "frames": self.frames}
+        for phase in self.PHASES:
+            row[f"{phase}_mean_ms"] = self.mean_ms(phase)
+            row[f"{phase}_max_ms"] = 1000 * self.max_s[phase]
+            row[f"{phase}_total_ms"] = 1000 * self.total_s[phase]
+        row["actual_tick_interval_ms"] = self.actual_tick_interval_ms()
+        row["target_tick_interval_ms"] = self.target_tick_interval_ms
+
+        write_header = not os.path.exists(path) or os.path.getsize(path) == 0
+        with open(path, "a", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=list(row.keys()))
+            if write_header:
+                writer.writeheader()
+            writer.writerow(row)
+
+
+class GameParameters():
+    # Constants of one game shared by birds, pillars and renderer, so they are not copied into every object.
+    # Sizes in pixels are only used for drawing, game itself uses relative sizes (as coeficient between 0 and 1).
+    # Physics constants in TUNABLE can be changed (e.g. by sweep.py), the rest is derived from them.
+    TUNABLE = ("gravity", "jump_velocity", "max_falling_speed", "pillar_gap_size", "scroll_speed_per_sec")
+
+    __slots__ = ("engine_interval_ms", "canvas_width", "canvas_height", "scroll_speed_per_sec", "scroll_speed_per_tick",
+                 "bird_size_px", "bird_x", "bird_width_rel", "bird_diameter_rel", "gravity", "jump_velocity",
+                 "max_falling_speed", "updates_between_jumps", "pillar_width", "pillar_body_height",
+                 "pillar_head_size_rel", "pillar_body_height_rel", "pillar_dimensions", "pillar_distance_px",
+                 "pillar_distance_rel", "number_of_pillars", "pillar_gap_size")
+
+    def __init__(self, ENGINE_INTERVAL_MS, canvas_width = 600, canvas_height = 500, gravity = 0.1, jump_velocity = 0.03,
+                 max_falling_speed = -0.03, pillar_gap_size = 0.3, scroll_speed_per_sec = 0.2):
+        self.engine_interval_ms = ENGINE_INTERVAL_MS
+        self.canvas_width = canvas_width
+        self.canvas_height = canvas_height
 
-        self.scroll_speed_per_sec = 0.2
+        self.scroll_speed_per_sec = scroll_speed_per_sec
         self.scroll_speed_per_tick = self.scroll_speed_per_sec / (1000 / ENGINE_INTERVAL_MS)
-        
-        self.ENGINE_INTERVAL_MS = ENGINE_INTERVAL_MS
-        self.canvas = canvas
-        self.canvas_width = self.canvas.winfo_width()
-        self.canvas_height = self.canvas.winfo_height()
 
-        
+        # birds
         self.bird_size_px = 40 # pixels
+        self.bird_x = 0.5 # middle of screen
+        self.bird_width_rel = self.bird_size_px / canvas_height
+        self.bird_diameter_rel = self.bird_width_rel / 2
+
+        self.gravity = gravity
+        self.jump_velocity = jump_velocity # added vertical acceleration when jump initiated
+        self.max_falling_speed = max_falling_speed
+        self.updates_between_jumps = 1000 * 0.2 / ENGINE_INTERVAL_MS # 1/(time between updates in sec) * 0.2 = jump each 0.2 second
 
+        # pillars
         self.pillar_width = 90 # pixels
+        self.pillar_body_height = round(canvas_height / 2) # pixels
+        self.pillar_head_size_rel = self.pillar_width / canvas_height
+        self.pillar_body_height_rel = self.pillar_body_height / canvas_height
+        self.pillar_dimensions = (self.pillar_head_size_rel, self.pillar_body_height_rel + self.pillar_head_size_rel)
+
         self.pillar_distance_px = 3 * self.pillar_width
-        self.pillar_distance_rel = self.pillar_distance_px / self.canvas_width
-        self.number_of_pillars = 1 + ceil(self.canvas_width / (self.pillar_distance_px + self.pillar_width))
-        self.pillar_gap_size = 0.3 # vertical distance between pillars (as coeficient between 0 and 1)
+        self.pillar_distance_rel = self.pillar_distance_px / canvas_width
+        # one more pillar than the screen needs, so the pillar after the active one (lookahead inputs) is always
+        # ahead of it - otherwise the ring wraps around to a pillar the birds already passed
+        self.number_of_pillars = 2 + ceil(canvas_width / (self.pillar_distance_px + self.pillar_width))
+        self.pillar_gap_size = pillar_gap_size # vertical distance between pillars (as coeficient between 0 and 1)
+
+
+class Game():
+    
+    def __init__(self, ENGINE_INTERVAL_MS, genomes, config, canvas_width = 600, canvas_height = 500, seed = None, course = None, budget = None, evaluation = None, physics = None):
+        # Game only simulates the world in relative coordinates (0 to 1). Canvas size is only used to
+        # derive relative sizes of bird and pillars, so the game can run without any tkinter window.
+
+        # limits of the game (see EvaluationBudget), None = game runs until all birds die
+        self.budget = budget
+        # number of courses played at once (see CourseEvaluation)
+        self.evaluation = evaluation if evaluation != None else CourseEvaluation()
         
-        self.images = {
-            "bird": ImageTk.PhotoImage(Image.open("bird.png").resize((self.bird_size_px, self.bird_size_px), Image.Resampling.LANCZOS)),
-            "pillar_body_bottom": ImageTk.PhotoImage(Image.open("pillar_body.png").resize((self.pillar_width, round(self.canvas_height / 2)), Image.Resampling.LANCZOS)),
-            "pillar_body_top": ImageTk.PhotoImage(Image.open("pillar_body.png").resize((self.pillar_width, round(self.canvas_height / 2)), Image.Resampling.LANCZOS).rotate(180)),
-            "pillar_head_bottom": ImageTk.PhotoImage(Image.open("pillar_head.png").resize((self.pillar_width, self.pillar_width), Image.Resampling.LANCZOS)),
-            "pillar_head_top": ImageTk.PhotoImage(Image.open("pillar_head.png").resize((self.pillar_width, self.pillar_width), Image.Resampling.LANCZOS).rotate(180))
-        }
+        # constants shared by birds, pillars and renderer (physics = dictionary overriding GameParameters.TUNABLE)
+        self.params = GameParameters(ENGINE_INTERVAL_MS, canvas_width, canvas_height, **(physics or {}))
 
-        for i in range(self.number_of_pillars):
+        # Pillar objects live as long as the game (renderer keeps their canvas items), reset only moves them back
+        self.courses = None
+        self.pillars_created = 0
+        self.pillar_instances = []
+        for i in range(self.params.number_of_pillars):
             self.create_pillar_instance(i)
-            self.pillar_instances[i].update_active_pillar_status()
+        
+        # pillars ordered by x-position as they scroll, keeps track of the pillar in front of the birds
+        self.track = PillarTrack(self.pillar_instances, self.params)
+
+        # engine update split into named phases (names are used by PhaseProfiler), executed in this order
+        self.tick_phases = [("collisions", self.check_for_collisions),
+                            ("physics", self.physics_update_all_birds),
+                            ("pillars", self.physics_move_all_pillars),
+                            ("ordering", self.order_pillars),
+                            ("AI_decision", self.make_AI_decision),
+                            ("dead_birds", self.remove_dead_birds),
+                            ("budget", self.check_budget)]
+
+        self.reset(genomes, config, seed, course)
+
+    def reset(self, genomes, config, seed = None, course = None):
+        """
+        Starts new game with new genomes in the same world - pillar objects (and their canvas items
+        in renderer) are reused, only birds, networks and pillar positions are replaced.
+
+        Arguments:
+        genomes: list
+            (genome_id, genome) pairs, fitness is assigned to genomes when the game ends
+        config: neat.Config
+            Configuration used to create networks
+        seed: int
+            Seed of pillar heights (random when neither seed nor course is given), seeds of other
+            courses are derived from it when more courses are played
+        course: Course
+            Pillar heights, takes precedence over seed (only for single course)
+        """
+
+        self.game_running = True
+
+        # pre-generated pillar heights - games with the same course (seed) have the same pillars
+        num_courses = self.evaluation.num_courses
+        if course != None:
+            if num_courses != 1:
+                raise ValueError("Course can be given only for game with single course")
+            self.courses = [course]
+        else:
+            seed = seed if seed != None else Random().getrandbits(32)
+            self.courses = [get_course(course_seed) for course_seed in self.evaluation.course_seeds(seed)]
+        self.pillars_created = 0 # number of pillars placed so far = index of next height in course
+
+        self.ticks_played = 0
+        self.pillars_passed = 0
+        self.best_finished_fitness = [] # heap with top-k fitnesses of genomes which finished in all worlds
+        self.worlds_playing = np.full(len(genomes), num_courses) # number of worlds where genome's bird is alive
+
+        for i, pillar in enumerate(self.pillar_instances):
+            pillar.center_position[0] = pillar.initial_x(i)
+            pillar.set_height(self.next_pillar_height())
+        self.track.reset()
         
         # creating neural network
-        self.bird_instances = []
-        self.network_instances = []
-        self.genome_instances = []
+        network_instances = []
+        self.genome_instances = [] # indexed by bird ID, fitness is written into them once the game ends
 
         for i, (genome_id, genome) in enumerate(genomes):
             net = neat.nn.FeedForwardNetwork.create(genome, config)
-            self.network_instances.append(net)
+            network_instances.append(net)
             self.genome_instances.append(genome)
-            self.create_bird_instance()
+        
+        # all networks compiled to arrays, so the whole population decides in one call
+        self.networks = PopulationNetwork.create(network_instances)
+        if num_courses > 1:
+            # network of each genome is repeated for every world (same order as birds)
+            self.networks.keep_only(np.tile(np.arange(len(self.genome_instances)), num_courses))
+
+        # observers (e.g. ReplayRecorder) belong to one game
+        self.observers = []
+        
+        # state of all birds (one array item per genome in each world)
+        self.birds = BirdPopulation(len(self.genome_instances), self.params, num_courses)
         
     
-    def update_score_label(self):
-        if self.label_score_widget != None:
-            scores = []
-            for bird in self.bird_instances:
-                scores.append(bird.score)
-            
-            top_scores = np.array(sorted(scores, reverse=True)[:min(3, len(scores))])
-            top_scores = np.round(top_scores, 3)
-            self.label_score_widget.config(text = f"{top_scores}")
+    def tick(self):
+        # one engine update
+        for phase_name, phase in self.tick_phases:
+            phase()
+        self.notify_observers()
+
+    def add_observer(self, observer):
+        # observer gets start(game) now and on_tick(game) after every tick (e.g. ReplayRecorder)
+        observer.start(self)
+        self.observers.append(observer)
+
+    def notify_observers(self):
+        for observer in self.observers:
+            observer.on_tick(self)
+
+    def run(self):
+        # runs the whole generation as fast as possible (no rendering, no waiting between ticks)
+        while self.game_running:
+            self.tick()
+
+    def stats(self):
+        # summary of the game (see TelemetryReporter), death counts are collected instead of printing every death
+        return {"ticks": self.ticks_played, "pillars": self.pillars_passed, "deaths": dict(self.birds.death_counts)}
+
+    def top_scores(self, n):
+        return sorted(self.birds.score[self.birds.alive].tolist(), reverse=True)[:n]
+
+    def AI_inputs(self):
+        # bird y and its distance to inner edges of the active pillar (3 inputs), networks with
+        # 5 inputs also get distances to the pillar after it
+        lookahead = (self.networks.num_inputs - 1) // 2
+        if self.networks.num_inputs not in (3, 5):
+            raise ValueError(f"Networks must have 3 or 5 inputs, not {self.networks.num_inputs}")
+
+        bird_y = self.birds.bird_y
+        world = self.birds.world
+        inputs = [bird_y]
+        for pillar in self.track.lookahead(lookahead):
+            inputs.append(np.abs(per_bird(pillar.world_top_head_inner_y, world) - bird_y))
+            inputs.append(np.abs(per_bird(pillar.world_bottom_head_inner_y, world) - bird_y))
+        return np.column_stack(inputs)
 
     def make_AI_decision(self):
-        active_pillar_index = None
-        for i, pillar in enumerate(self.pillar_instances):
-            if pillar.active_pillar:
-                active_pillar_index = i
-                break
+        neuron_output = self.networks.activate(self.AI_inputs())[:, 0]
         
-        if active_pillar_index == None:
-            raise ValueError("No active pillar!")
-        
-        top_pillar_inner_y = self.pillar_instances[active_pillar_index].top_head_inner_y
-        bot_pillar_inner_y = self.pillar_instances[active_pillar_index].bottom_head_inner_y
-
-        for i in range(len(self.bird_instances)):
-            
-            bird_y = self.bird_instances[i].bird_y
-            top_distance = abs(top_pillar_inner_y - bird_y)
-            bot_distance = abs(bot_pillar_inner_y - bird_y)
-            
-            neuron_output = self.network_instances[i].activate([bird_y, top_distance, bot_distance])[0]
-            
-            if neuron_output > 0.5:
-                self.bird_instances[i].jump()
-
-    def create_bird_instance(self):
-        self.bird_instances.append(Bird(self.canvas_width, self.canvas_height, self.ENGINE_INTERVAL_MS, self.images["bird"], self.bird_size_px))
+        self.birds.jump(neuron_output > 0.5)
 
     def create_pillar_instance(self, pillar_rank):
-        self.pillar_instances.append(Pillar(self.images["pillar_head_top"],
-                                            self.images["pillar_head_bottom"],
-                                            self.images["pillar_body_bottom"],
-                                            self.images["pillar_body_top"],
-                                            self.canvas,
-                                            self.pillar_width,
-                                            self.images["pillar_body_top"].height(),
-                                            self.pillar_gap_size,
-                                            pillar_rank,
-                                            self.pillar_distance_rel))
+        # height is set by reset
+        self.pillar_instances.append(Pillar(self.params, pillar_rank, 0.5))
+
+    def next_pillar_height(self):
+        # heights of the pillar in all worlds
+        heights = np.array([course.height(self.pillars_created) for course in self.courses])
+        self.pillars_created += 1
+        return heights
 
     def physics_update_all_birds(self):
-        for instance in self.bird_instances:
-            instance.physics_update()
-            instance.increse_bird_score(0.01)
+        self.birds.physics_update()
+        self.birds.increse_bird_score(0.01)
     
     def physics_move_all_pillars(self):
-        for pillar_instance in self.pillar_instances:
-            pillar_instance.center_position[0] -= self.scroll_speed_per_tick
-    
-    def graphics_update_all_birds(self):
-        for instance in self.bird_instances:
-            instance.graphics_update(self.canvas)
-
-    def graphics_update_all_pillars(self):
-        for instance in self.pillar_instances:
-            instance.allign_by_center_position()
+        self.track.scroll(self.params.scroll_speed_per_tick)
 
     def check_for_collisions(self):
-        for bird_instance in self.bird_instances:
-            # Check for collision with ground (bottom)
-            if bird_instance.bird_y - bird_instance.bird_diameter_rel <= 0:
-                bird_instance.death(self.canvas, "floor")
-            # Check for collision with sky (top)
-            if bird_instance.bird_y >= 1:
-                bird_instance.death(self.canvas, "ceiling")
-            # Check for collision with pillars
-            for pillar_instance in self.pillar_instances:
-                if pillar_instance.check_for_bird_collision(bird_instance.bird_y, bird_instance.bird_diameter_rel): # returns bool
-                    bird_instance.death(self.canvas, "pillar")
+        birds = self.birds
+        # Check for collision with ground (bottom)
+        birds.death(birds.bird_y - self.params.bird_diameter_rel <= 0, "floor")
+        # Check for collision with sky (top)
+        birds.death(birds.bird_y >= 1, "ceiling")
+        # Check for collision with pillars (only those overlapping with birds on x-axis)
+        bird_x = self.params.bird_x
+        bird_radius = self.params.bird_diameter_rel
+        for pillar_instance in self.track.pillars_in_band(bird_x - bird_radius, bird_x + bird_radius):
+            birds.death(pillar_instance.check_for_bird_collision(birds.bird_y, birds.world), "pillar") # returns bool array
     
     def remove_dead_birds(self):
-        to_be_removed = []
-        for i, bird in enumerate(self.bird_instances):
-            if not bird.alive:
-                to_be_removed.append(i)
-        
-        if len(to_be_removed) > 0:
-            for i, index in enumerate(to_be_removed):
-                self.genome_instances[index - i].fitness = self.bird_instances[index - i].score
-                
-                self.bird_instances.pop(index - i)
-                self.network_instances.pop(index - i)
-                self.genome_instances.pop(index - i)
-        
-        if len(self.bird_instances) == 0:
+        # Dead birds are only flagged in alive mask and their fitness is stored in one batch per tick,
+        # arrays are compacted once at least half of their items are dead, so the cost of compaction
+        # is spread over many deaths - even when most of the population dies in a single tick.
+        birds = self.birds
+        retired_ids = birds.store_retired_fitness()
+        if self.budget != None and self.budget.top_k != None and len(retired_ids) > 0:
+            self.remember_finished_genomes(retired_ids)
+
+        if birds.num_alive == 0:
             self.game_running = False
-            print("-- All genomes died --")
+            fitness = birds.fitness.reshape(self.evaluation.num_courses, len(self.genome_instances))
+            if self.evaluation.num_courses > 1:
+                fitness = self.evaluation.aggregate(fitness)
+            else:
+                fitness = fitness[0]
+            for genome, genome_fitness in zip(self.genome_instances, fitness.tolist()):
+                genome.fitness = genome_fitness
+            print("-- All genomes died --", birds.death_summary())
+        elif birds.num_alive * 2 <= len(birds):
+            survivors = np.flatnonzero(birds.alive)
+            birds.keep_only(survivors)
+            self.networks.keep_only(survivors)
 
-                
-        
     def order_pillars(self):
-        for pillar_instance in self.pillar_instances:
-            if pillar_instance.center_position[0] + pillar_instance.pillar_dimensions[0] < 0:
-                print("Pillar out of bounds - moved to the end")
-                pillar_instance.center_position[0] = self.pillar_instances[-1].center_position[0] + self.pillar_distance_rel
-                pillar_instance.randomize_height()
-                
-                self.pillar_instances.append(self.pillar_instances.pop(0))
-                self.add_score_to_birds()
-                break
+        if self.track.first_out_of_bounds():
+            self.track.move_first_to_end(self.next_pillar_height())
+            self.add_score_to_birds()
     
     def add_score_to_birds(self):
-        for bird in self.bird_instances:
-            if bird.alive:
-                bird.score += 1
+        self.birds.score[self.birds.alive] += 1
+        self.pillars_passed += 1
+
+    def remember_finished_genomes(self, retired_ids):
+        # genome is finished once its birds in all worlds are retired, its fitness is final then
+        num_genomes = len(self.genome_instances)
+        genomes, counts = np.unique(retired_ids % num_genomes, return_counts=True)
+        self.worlds_playing[genomes] -= counts
+        finished = genomes[self.worlds_playing[genomes] == 0]
+        if len(finished) == 0:
+            return
+        fitness = self.evaluation.aggregate(self.birds.fitness.reshape(self.evaluation.num_courses, num_genomes)[:, finished])
+
+        # only the best k fitnesses of the batch can get into the heap
+        for value in np.sort(fitness)[-self.budget.top_k:].tolist():
+            if len(self.best_finished_fitness) < self.budget.top_k:
+                heapq.heappush(self.best_finished_fitness, value)
+            else:
+                heapq.heappushpop(self.best_finished_fitness, value)
+
+    def check_budget(self):
+        self.ticks_played += 1
+        if self.budget == None or not self.game_running:
+            return
+        budget = self.budget
+
+        if ((budget.max_ticks != None and self.ticks_played >= budget.max_ticks) or
+            (budget.max_pillars != None and self.pillars_passed >= budget.max_pillars) or
+            (budget.fitness_threshold != None and self.birds.score.max(where=self.birds.alive, initial=-np.inf) >= budget.fitness_threshold)):
+            self.end_game()
+            return
+
+        if budget.top_k != None and budget.max_ticks != None and len(self.best_finished_fitness) == budget.top_k:
+            self.prune_birds()
+
+    def end_game(self):
+        # living birds are retired with their current score (without penalty for death)
+        self.birds.retire(self.birds.alive)
+        self.remove_dead_birds()
+
+    def prune_birds(self):
+        # Genomes which can't get into top-k even if their living birds survive until the end of budget are retired now.
+        # Fitness of such genome stays below k-th best one, so order of the top-k is not affected.
+        # All living birds of one world have the same score, so genomes only differ by worlds where their birds died
+        # - pruning never retires anything with a single course.
+        remaining_ticks = self.budget.max_ticks - self.ticks_played
+        max_pillars = ceil(remaining_ticks * self.params.scroll_speed_per_tick / self.params.pillar_distance_rel) + 1
+        if self.budget.max_pillars != None:
+            max_pillars = min(max_pillars, self.budget.max_pillars - self.pillars_passed)
+        max_score_gain = 0.01 * remaining_ticks + max_pillars
+
+        # the best possible fitness - living birds gain the most, retired ones keep their fitness
+        # (mean, min and percentiles only grow when any of the aggregated scores grows)
+        birds = self.birds
+        num_genomes = len(self.genome_instances)
+        best_possible = birds.fitness.copy()
+        best_possible[birds.bird_id[birds.alive]] = birds.score[birds.alive] + max_score_gain
+        best_possible = self.evaluation.aggregate(best_possible.reshape(self.evaluation.num_courses, num_genomes))
+
+        hopeless_genomes = (best_possible < self.best_finished_fitness[0]) & (self.worlds_playing > 0)
+        if not hopeless_genomes.any():
+            return
+        hopeless = hopeless_genomes[birds.bird_id % num_genomes] & birds.alive
+        if hopeless.any():
+            self.birds.retire(hopeless)
+            self.remove_dead_birds()
+
+
+class TkRenderer():
+    # Draws state of a Game onto tkinter canvas. Game itself never touches the canvas,
+    # renderer only reads positions of birds and pillars and moves canvas images accordingly.
+    # Canvas items are only moved when their pixel position changed. When there are more birds than
+    # max_drawn_birds, only the best ones are drawn and the rest is shown as density strip on the side.
+
+    def __init__(self, canvas, game, max_drawn_birds = 200):
+        self.canvas = canvas
+        self.game = game
+        self.max_drawn_birds = max_drawn_birds
 
+        self.HEAT_STRIP_BINS = 50
+        self.HEAT_STRIP_WIDTH_PX = 12
 
-class Pillar():
-    def __init__(self, image_head_top, image_head_bottom, image_body_bottom, image_body_top, canvas, pillar_width, pillar_body_height, gap_size, x_pos_rank, pillar_x_distance):
-        
-        self.pillar_x_distance = pillar_x_distance
+        from PIL import Image, ImageTk
+        bird_size_px = game.params.bird_size_px
+        pillar_width = game.params.pillar_width
+        pillar_body_height = game.params.pillar_body_height
 
-        self.pillar_body_height_px = pillar_body_height
-        self.pillar_body_height_rel = self.pillar_body_height_px / canvas.winfo_height()
-        
-        self.pillar_head_size_px = pillar_width
-        self.pillar_head_size_rel = self.pillar_head_size_px / canvas.winfo_height()
+        self.images = {
+            "bird": ImageTk.PhotoImage(Image.open("bird.png").resize((bird_size_px, bird_size_px), Image.Resampling.LANCZOS)),
+            "pillar_body_bottom": ImageTk.PhotoImage(Image.open("pillar_body.png").resize((pillar_width, pillar_body_height), Image.Resampling.LANCZOS)),
+            "pillar_body_top": ImageTk.PhotoImage(Image.open("pillar_body.png").resize((pillar_width, pillar_body_height), Image.Resampling.LANCZOS).rotate(180)),
+            "pillar_head_bottom": ImageTk.PhotoImage(Image.open("pillar_head.png").resize((pillar_width, pillar_width), Image.Resampling.LANCZOS)),
+            "pillar_head_top": ImageTk.PhotoImage(Image.open("pillar_head.png").resize((pillar_width, pillar_width), Image.Resampling.LANCZOS).rotate(180))
+        }
 
-        # If this pipe is the closest to the bird (middle of screen)
-        self.active_pillar = False
+        # canvas size is read only when canvas changes, not on every drawn item
+        self.canvas_width = canvas.winfo_width()
+        self.canvas_height = canvas.winfo_height()
+        canvas.bind("<Configure>", self.on_canvas_resize)
 
-        self.canvas = canvas
+        # Birds look all the same, so bird sprites are a pool - i-th sprite draws i-th drawn bird.
+        # Sprites which are not needed (dead birds) are hidden and reused later.
+        self.bird_sprites = []
+        self.bird_sprite_positions = [] # last drawn pixel position of each sprite (None = hidden)
         
+        self.pillar_canvas_ids = {} # pillar instance -> (top head, top body, bottom head, bottom body)
+        self.pillar_positions = {} # pillar instance -> last drawn pixel position (x, top y, bottom y)
+
         # creating canvas objects to get IDs, but are placed out of screen
-        self.canvas_id_bottom_head = canvas.create_image(-10*pillar_width, 0, anchor="n",image=image_head_bottom)
-        self.canvas_id_bottom_body = canvas.create_image(-10*pillar_width, 0, anchor="n",image=image_body_bottom)
-        self.canvas_id_top_head = canvas.create_image(-10*pillar_width, 0, anchor="s",image=image_head_top)
-        self.canvas_id_top_body = canvas.create_image(-10*pillar_width, 0, anchor="s",image=image_body_top)
+        for i, pillar in enumerate(game.pillar_instances):
+            tag = f"pillar_{i}" # all 4 images of pillar can be moved by one call when only x changes
+            self.pillar_canvas_ids[pillar] = (canvas.create_image(-10*pillar_width, 0, anchor="s", image=self.images["pillar_head_top"], tags=tag),
+                                              canvas.create_image(-10*pillar_width, 0, anchor="s", image=self.images["pillar_body_top"], tags=tag),
+                                              canvas.create_image(-10*pillar_width, 0, anchor="n", image=self.images["pillar_head_bottom"], tags=tag),
+                                              canvas.create_image(-10*pillar_width, 0, anchor="n", image=self.images["pillar_body_bottom"], tags=tag),
+                                              tag)
+            self.pillar_positions[pillar] = None
+
+        # density of birds along y-axis, shown only when not all birds are drawn
+        self.heat_strip = []
+        self.heat_strip_colors = []
+        for i in range(self.HEAT_STRIP_BINS):
+            self.heat_strip.append(canvas.create_rectangle(0, 0, 0, 0, width=0, fill="#000000", state="hidden"))
+            self.heat_strip_colors.append(None)
+        self.heat_strip_visible = False
+        self.place_heat_strip()
+        
+        self.graphics_update_all_pillars()
+
+    def on_canvas_resize(self, event):
+        self.canvas_width = event.width
+        self.canvas_height = event.height
+        # everything has to be placed again
+        self.bird_sprite_positions = [None if position == None else (None, None) for position in self.bird_sprite_positions]
+        self.pillar_positions = {pillar: None for pillar in self.pillar_positions}
+        self.place_heat_strip()
+
+    def draw(self):
+        self.graphics_update_all_birds()
+        self.graphics_update_all_pillars()
+
+    def drawn_bird_indices(self):
+        # dead birds stay in population arrays until they are compacted
+        birds = self.game.birds
+        alive = np.flatnonzero(birds.alive)
+        if len(alive) <= self.max_drawn_birds:
+            return alive
+        # best birds first (stable sort keeps order of birds with the same score)
+        return alive[np.argsort(-birds.score[alive], kind="stable")[:self.max_drawn_birds]]
 
-        self.bottom_head_inner_y = None
-        self.top_head_inner_y = None
+    def graphics_update_all_birds(self):
+        birds = self.game.birds
+        params = self.game.params
+        drawn = self.drawn_bird_indices()
+
+        x = round(self.canvas_width - params.bird_x * self.canvas_width - params.bird_size_px / 2)
+        ys = np.rint(self.canvas_height - birds.bird_y[drawn] * self.canvas_height - params.bird_size_px / 2).astype(int).tolist()
+
+        while len(self.bird_sprites) < len(ys):
+            self.bird_sprites.append(self.canvas.create_image(x, ys[len(self.bird_sprites)], anchor="nw", image=self.images["bird"]))
+            self.bird_sprite_positions.append((None, None))
+
+        for i, y in enumerate(ys):
+            position = self.bird_sprite_positions[i]
+            if position == (x, y):
+                continue
+            if position == None:
+                self.canvas.itemconfigure(self.bird_sprites[i], state="normal")
+            self.canvas.moveto(self.bird_sprites[i], x, y)
+            self.bird_sprite_positions[i] = (x, y)
+
+        for i in range(len(ys), len(self.bird_sprites)):
+            if self.bird_sprite_positions[i] != None:
+                self.canvas.itemconfigure(self.bird_sprites[i], state="hidden")
+                self.bird_sprite_positions[i] = None
+
+        self.graphics_update_heat_strip(len(drawn) < birds.num_alive)
+
+    def place_heat_strip(self):
+        bin_height = self.canvas_height / self.HEAT_STRIP_BINS
+        for i, item in enumerate(self.heat_strip):
+            # bin 0 is at the bottom (y = 0)
+            self.canvas.coords(item,
+                               self.canvas_width - self.HEAT_STRIP_WIDTH_PX, self.canvas_height - (i + 1) * bin_height,
+                               self.canvas_width, self.canvas_height - i * bin_height)
+
+    def graphics_update_heat_strip(self, visible):
+        if visible != self.heat_strip_visible:
+            for item in self.heat_strip:
+                self.canvas.itemconfigure(item, state="normal" if visible else "hidden")
+            self.heat_strip_visible = visible
+        if not visible:
+            return
+
+        birds = self.game.birds
+        counts, edges = np.histogram(birds.bird_y[birds.alive], bins=self.HEAT_STRIP_BINS, range=(0, 1))
+        levels = np.rint(255 * counts / max(1, counts.max())).astype(int).tolist()
+        for i, level in enumerate(levels):
+            color = f"#{level:02x}{level:02x}00" # black (no birds) to yellow (most birds)
+            if color != self.heat_strip_colors[i]:
+                self.canvas.itemconfigure(self.heat_strip[i], fill=color)
+                self.heat_strip_colors[i] = color
 
-        self.gap_size = gap_size # vertical distance between pillars (as coeficient between 0 and 1)
-        
-        self.pillar_dimensions = [self.pillar_head_size_rel,
-                                  self.pillar_body_height_rel + self.pillar_head_size_rel]
-        
-        self.center_position = [1 + x_pos_rank * pillar_x_distance, None]
-        self.randomize_height()
-        self.allign_by_center_position()
+    def graphics_update_all_pillars(self):
+        for pillar in self.game.pillar_instances:
+            self.allign_pillar_by_center_position(pillar)
 
-        
+    def allign_pillar_by_center_position(self, pillar):
+        _canvas_width = self.canvas_width
+        _canvas_height = self.canvas_height
+        pillar_width = self.game.params.pillar_width
+        pillar_body_height = self.game.params.pillar_body_height
 
-    def allign_by_center_position(self):
-        _canvas_width = self.canvas.winfo_width()
-        _canvas_height = self.canvas.winfo_height()
-        
-        # Calculating the inner y-coordinate (hitbox) as value between 0 and 1 (0 = bottom side, 1 = top side)
-        self.bottom_head_inner_y = self.center_position[1] - self.gap_size / 2
-        self.top_head_inner_y = self.center_position[1] + self.gap_size / 2
+        pillar_x = round(pillar.center_position[0] * _canvas_width - pillar_width / 2)
+        top_y = round(_canvas_height - pillar.top_head_inner_y * _canvas_height)
+        bottom_y = round(_canvas_height - pillar.bottom_head_inner_y * _canvas_height)
 
-        #print((self.bottom_head_inner_y, self.top_head_inner_y))
-        #print((self.bottom_head_inner_y * _canvas_height, self.top_head_inner_y * _canvas_height))
+        top_head, top_body, bottom_head, bottom_body, tag = self.pillar_canvas_ids[pillar]
+        last_position = self.pillar_positions[pillar]
+        self.pillar_positions[pillar] = (pillar_x, top_y, bottom_y)
 
-        #print((_canvas_width, _canvas_height))
+        if last_position == (pillar_x, top_y, bottom_y):
+            return
+        
+        # pillar only scrolled - all its images are moved together
+        if last_position != None and last_position[1:] == (top_y, bottom_y):
+            self.canvas.move(tag, pillar_x - last_position[0], 0)
+            return
 
         # top pillar
-        self.canvas.moveto(self.canvas_id_top_head,
-                            self.center_position[0] * _canvas_width - self.pillar_head_size_px / 2,
-                            _canvas_height - self.top_head_inner_y * _canvas_height - self.pillar_head_size_px)
+        self.canvas.moveto(top_head,
+                            pillar_x,
+                            top_y - pillar_width)
 
-        self.canvas.moveto(self.canvas_id_top_body,
-                            self.center_position[0] * _canvas_width - self.pillar_head_size_px / 2,
-                            _canvas_height - self.top_head_inner_y * _canvas_height - self.pillar_head_size_px - self.pillar_body_height_px)
+        self.canvas.moveto(top_body,
+                            pillar_x,
+                            top_y - pillar_width - pillar_body_height)
         
         # bottom pillar
-        self.canvas.moveto(self.canvas_id_bottom_head,
-                            self.center_position[0] * _canvas_width - self.pillar_head_size_px / 2,
-                            _canvas_height - self.bottom_head_inner_y * _canvas_height)
+        self.canvas.moveto(bottom_head,
+                            pillar_x,
+                            bottom_y)
 
-        self.canvas.moveto(self.canvas_id_bottom_body,
-                            self.center_position[0] * _canvas_width - self.pillar_head_size_px / 2,
-                            _canvas_height - self.bottom_head_inner_y * _canvas_height + self.pillar_head_size_px)
-    
-    def randomize_height(self):
-        self.center_position[1] = uniform(0.2, 0.8)
+        self.canvas.moveto(bottom_body,
+                            pillar_x,
+                            bottom_y + pillar_width)
+
+
+class Course():
+    # Sequence of pillar heights generated from seed. Every game playing the same course sees exactly
+    # the same pillars, so fitness of different generations (or runs) can be compared fairly.
     
-    def update_active_pillar_status(self):
-        if self.center_position[0] > (0.5 - self.pillar_head_size_rel) and self.center_position[0] <= (0.5 + self.pillar_x_distance + self.pillar_head_size_rel):
-            self.active_pillar = True
-        else:
-            self.active_pillar = False
+    def __init__(self, seed, length = 1000):
+        self.seed = seed
+        self.random = Random(seed)
+        self.heights = []
+        self.extend(length)
 
-    def check_for_bird_collision(self, bird_y, bird_diameter):     
-        check_collision_pring_debug = False
-        # 0.5 = middle of screen
-        # TODO: bird left and right could be calculated only once for all pillars (pass it as argument of this function)
+    def extend(self, length):
+        # continues with the same random generator, so extended course is still the same for given seed
+        self.heights.extend(self.random.uniform(0.2, 0.8) for i in range(length))
 
-        # calculating top left corner position of top pillar head
-        top_pillar_pos = [self.center_position[0] - self.pillar_dimensions[0] / 2,
-                          self.top_head_inner_y + self.pillar_dimensions[1]]
-        
-        # calculating top left corner position of bottom pillar head
-        bot_pillar_pos = [self.center_position[0] - self.pillar_dimensions[0] / 2,
-                          self.bottom_head_inner_y]
+    def height(self, pillar_index):
+        while pillar_index >= len(self.heights):
+            self.extend(len(self.heights))
+        return self.heights[pillar_index]
 
 
-        bird_left_x = 0.5 - bird_diameter
-        bird_right_x = 0.5 + bird_diameter
-        
-        pillar_left_x = self.center_position[0] - self.pillar_head_size_rel / 2
-        pillar_right_x = self.center_position[0] + self.pillar_head_size_rel / 2
-
-        # if it is even possible to collide on x-axis - optimalizead as it does not have to check collision with every bird
-        if bird_right_x >= pillar_left_x and bird_left_x <= pillar_right_x:
-            
-            if bird_y - bird_diameter < self.bottom_head_inner_y: # check bottom body pillar collision
-                if check_collision_pring_debug:
-                    print(f"Bottom body collision:\nbird x:{(bird_left_x, bird_right_x)}, y:{bird_y}\nPillar x:{pillar_left_x, pillar_right_x}\nTop inner y:{self.top_head_inner_y}\nBottom inner y:{self.bottom_head_inner_y}\n")
-                return True
-            if bird_y + bird_diameter > self.top_head_inner_y: # check top body pillar collision
-                if check_collision_pring_debug:
-                    print(f"Top body collision:\nbird x:{(bird_left_x, bird_right_x)}, y:{bird_y}\nPillar x:{pillar_left_x, pillar_right_x}\nTop inner y:{self.top_head_inner_y}\nBottom inner y:{self.bottom_head_inner_y}\n")
-                return True
-            
-            top_rectangle_collision = check_collision_circle_rectangle([0.5, bird_y], bird_diameter, top_pillar_pos, self.pillar_dimensions)
-            bot_rectangle_collision = check_collision_circle_rectangle([0.5, bird_y], bird_diameter, bot_pillar_pos, self.pillar_dimensions)
-            
-            if (top_rectangle_collision or bot_rectangle_collision):
-                if check_collision_pring_debug:
-                    print(f"Inner collision (Top, Bottom): {(top_rectangle_collision, bot_rectangle_collision)}\nbird x:{(bird_left_x, bird_right_x)}, y:{bird_y}\nPillar x:{pillar_left_x, pillar_right_x}\nTop inner y:{self.top_head_inner_y}\nBottom inner y:{self.bottom_head_inner_y}\n")
-                return True
-            else:
-                return False
-        else: # if bird is completely outside of pillars hitbox
-            return False
+@lru_cache(maxsize=64)
+def get_course(seed):
+    # courses are cached by seed, so games (and workers) replaying the same track generate it only once
+    return Course(seed)
 
-        
-        
-            
 
+class Pillar():
+    # Only position of the pillar is stored per instance, sizes are shared in GameParameters.
+    # Hitbox (y-coordinates of pillar heads) is computed when the pillar gets new height, as it
+    # does not change while the pillar scrolls. When more courses are played at once, pillar has
+    # the same x in all worlds, but its own height in each of them (scalars are for the first world).
+    __slots__ = ("params", "center_position", "heights", "bottom_head_inner_y", "top_head_inner_y",
+                 "world_bottom_head_inner_y", "world_top_head_inner_y", "world_top_head_outer_y")
 
+    def __init__(self, params, x_pos_rank, height):
+        self.params = params
 
-class Bird():
-    def __init__(self, canvas_width, canvas_height, ENGINE_INTERVAL_MS, bird_image, bird_size_px):
+        self.heights = None
+        self.bottom_head_inner_y = None
+        self.top_head_inner_y = None
+        self.world_bottom_head_inner_y = None
+        self.world_top_head_inner_y = None
+        self.world_top_head_outer_y = None
         
-        # Constants
-        self.engine_interval_ms = ENGINE_INTERVAL_MS
-        self.updates_between_jumps = 1000 * 0.2 / ENGINE_INTERVAL_MS # 1/(time between updates in sec) * 0.2 = jump each 0.2 second
-        self.bird_x = 0.5
-        self.bird_image = bird_image
+        self.center_position = [self.initial_x(x_pos_rank), None]
+        self.set_height(height)
 
-        self.bird_width_px = bird_size_px
-        self.bird_width_rel = bird_size_px / canvas_height # relative (as coeficient between 0 and 1)
-        self.bird_diameter_rel = self.bird_width_rel / 2
+    def initial_x(self, x_pos_rank):
+        # pillars start behind the right side of the screen
+        return 1 + x_pos_rank * self.params.pillar_distance_rel
+
+    def update_inner_y(self):
+        # Calculating the inner y-coordinate (hitbox) as value between 0 and 1 (0 = bottom side, 1 = top side)
+        self.world_bottom_head_inner_y = self.heights - self.params.pillar_gap_size / 2
+        self.world_top_head_inner_y = self.heights + self.params.pillar_gap_size / 2
+        self.world_top_head_outer_y = self.world_top_head_inner_y + self.params.pillar_dimensions[1]
+        self.bottom_head_inner_y = float(self.world_bottom_head_inner_y[0])
+        self.top_head_inner_y = float(self.world_top_head_inner_y[0])
+    
+    def set_height(self, height):
+        # height of the pillar in each world (or a single number)
+        self.heights = np.atleast_1d(np.asarray(height, dtype=float))
+        self.center_position[1] = float(self.heights[0])
+        self.update_inner_y()
+    
+    def is_out_of_bounds(self):
+        return self.center_position[0] + self.params.pillar_dimensions[0] < 0
+
+    def check_for_bird_collision(self, bird_y, world = None):
+        # bird_y is numpy array with y-coordinates of all birds and world is index of world of each bird,
+        # returns bool array (True = collision)
+        params = self.params
+        bird_x = params.bird_x
+        bird_radius = params.bird_diameter_rel
+
+        pillar_left_x = self.center_position[0] - params.pillar_head_size_rel / 2
+        pillar_right_x = self.center_position[0] + params.pillar_head_size_rel / 2
+
+        # if it is even possible to collide on x-axis - all birds share the same x, so it is checked only once
+        if bird_x + bird_radius < pillar_left_x or bird_x - bird_radius > pillar_right_x:
+            return np.zeros(len(bird_y), dtype=bool)
+
+        # Same test as check_collision_circle_rectangle with pillar heads - x-coordinate of the closest
+        # point is shared by all birds and y-coordinate of the closest point is the corner of the head
+        closest_x = max(pillar_left_x, min(bird_x, pillar_left_x + params.pillar_dimensions[0]))
+        distance_x_squared = (closest_x - bird_x) ** 2
+
+        bottom_head_inner_y = per_bird(self.world_bottom_head_inner_y, world)
+        top_head_inner_y = per_bird(self.world_top_head_inner_y, world)
+        top_head_outer_y = per_bird(self.world_top_head_outer_y, world)
+
+        collision = (bird_y - bird_radius < bottom_head_inner_y) | (bird_y + bird_radius > top_head_inner_y)
+        collision |= np.sqrt(distance_x_squared + (top_head_outer_y - bird_y) ** 2) < bird_radius
+        collision |= np.sqrt(distance_x_squared + (bottom_head_inner_y - bird_y) ** 2) < bird_radius
+        return collision
+
+
+def per_bird(world_values, world):
+    # values of worlds for each bird - with single world the value is simply broadcasted
+    if len(world_values) == 1:
+        return world_values
+    return world_values[world]
+
+
+class PillarTrack():
+    # Pillars stored as ring buffer ordered by x-position - "first" is the leftmost pillar, the one
+    # before it (in the ring) is the last one. Pillar leaving the screen only moves the "first" index,
+    # the list itself never changes. Index of the active pillar (the closest one which the birds
+    # did not pass yet) moves forward as pillars scroll, so it is never searched for.
+
+    def __init__(self, pillars, params):
+        self.pillars = pillars # ordered by x-position at the start
+        self.pillar_x_distance = params.pillar_distance_rel
+        self.bird_x = params.bird_x
+        self.pillar_head_size_rel = params.pillar_head_size_rel
+        self.reset()
+
+    def reset(self):
+        # pillars were placed back in order of the list
+        self.first = 0
+        self.active = 0
+        self.update_active()
+
+    def __len__(self):
+        return len(self.pillars)
+
+    def pillar(self, index):
+        # pillar by position in the ring (0 = first), can be negative (-1 = last)
+        return self.pillars[(self.first + index) % len(self.pillars)]
+
+    def scroll(self, distance):
+        for pillar in self.pillars:
+            pillar.center_position[0] -= distance
+        self.update_active()
+
+    def update_active(self):
+        # pillar stays active until it is completely behind the bird
+        active = self.pillars[self.active]
+        while active.center_position[0] <= self.bird_x - self.pillar_head_size_rel:
+            self.active = (self.active + 1) % len(self.pillars)
+            active = self.pillars[self.active]
+
+    def first_out_of_bounds(self):
+        return self.pillars[self.first].is_out_of_bounds()
+
+    def move_first_to_end(self, height):
+        pillar = self.pillars[self.first]
+        pillar.center_position[0] = self.pillar(-1).center_position[0] + self.pillar_x_distance
+        pillar.set_height(height)
+        self.first = (self.first + 1) % len(self.pillars)
+
+    def active_pillar(self):
+        return self.pillars[self.active]
+
+    def lookahead(self, count):
+        # active pillar and (count - 1) pillars after it
+        return [self.pillars[(self.active + i) % len(self.pillars)] for i in range(count)]
+
+    def pillars_in_band(self, left_x, right_x):
+        # pillars overlapping with x-band [left_x, right_x] - pillars before the active one are
+        # completely behind the bird, so search starts at the active pillar and ends at first pillar after the band
+        pillars = []
+        for i in range(len(self.pillars)):
+            pillar = self.pillars[(self.active + i) % len(self.pillars)]
+            if pillar.center_position[0] - self.pillar_head_size_rel / 2 > right_x:
+                break
+            if pillar.center_position[0] + self.pillar_head_size_rel / 2 >= left_x:
+                pillars.append(pillar)
+        return pillars
 
-        self.canvas_width = canvas_width
-        self.canvas_height = canvas_height
 
-        self.gravity = 0.1
-        self.jump_velocity = 0.03 # added vertical acceleration when jump initiated
-        self.velocity = 0 # vertical velocity of bird
-        self.max_falling_speed = -0.03
+class BirdPopulation():
+    # State of all birds is stored as numpy arrays (one item per bird), so physics and collisions
+    # are computed for the whole population at once instead of looping over bird objects.
+    # With more worlds (courses played at once) every genome has one bird in each world,
+    # birds are ordered by world (bird ID = world * size + genome index).
+    __slots__ = ("params", "bird_id", "world", "velocity", "updates_since_last_jump", "score", "can_jump", "bird_y",
+                 "alive", "num_alive", "fitness", "retired_indices", "death_counts")
+
+    def __init__(self, size, params, num_worlds = 1):
+        
+        # Constants (shared by all birds)
+        self.params = params
         
         # Variables - assigned default values
-        self.opaque = False # if bird should be displayed partialy opaque
-
-        self.canvas_id = None
-        self.updates_since_last_jump = 0
-        self.score = 0
-        self.can_jump = True
+        self.world = np.repeat(np.arange(num_worlds), size)
+        size *= num_worlds
+        self.bird_id = np.arange(size) # stays the same for bird even when dead birds are removed
+        self.velocity = np.zeros(size) # vertical velocity of bird
+        self.updates_since_last_jump = np.zeros(size, dtype=np.int64)
+        self.score = np.zeros(size)
+        self.can_jump = np.ones(size, dtype=bool)
         
-        self.bird_y = 0.7
-
-        self.alive = True
-
-    def death(self, canvas, reason = "unknown"):
-        self.alive = False
-        self.score -= 1
-        print(f"Bird {self.canvas_id} died - reason: {reason}")
-        canvas.delete(self.canvas_id)
-
-    def jump(self):
-        if self.can_jump:
-            self.can_jump = False
-            self.updates_since_last_jump = 0
-            self.velocity = self.jump_velocity
+        self.bird_y = np.full(size, 0.7)
+
+        self.alive = np.ones(size, dtype=bool)
+        self.num_alive = size
+
+        # Results of retired birds (indexed by bird ID), so arrays above can be compacted at any time
+        self.fitness = np.zeros(size)
+        self.retired_indices = [] # retired since last store_retired_fitness (arrays are not compacted in between)
+        self.death_counts = {} # reason -> number of birds
+
+    def __len__(self):
+        # number of birds in arrays, including dead ones which were not compacted yet (see num_alive)
+        return len(self.bird_y)
+
+    def death(self, mask, reason = "unknown"):
+        newly_dead = mask & self.alive
+        number_of_dead = int(np.count_nonzero(newly_dead))
+        if number_of_dead > 0:
+            self.score[newly_dead] -= 1
+            self.death_counts[reason] = self.death_counts.get(reason, 0) + number_of_dead
+            self.retire(newly_dead)
+
+    def retire(self, mask):
+        # bird stops playing with its current score as fitness
+        retired = np.flatnonzero(mask & self.alive)
+        if len(retired) == 0:
+            return
+        self.alive[retired] = False
+        self.num_alive -= len(retired)
+        self.retired_indices.append(retired)
+
+    def store_retired_fitness(self):
+        # score of birds retired since the last call becomes their fitness, returns IDs of these birds
+        if len(self.retired_indices) == 0:
+            return self.bird_id[:0]
+        retired = np.concatenate(self.retired_indices)
+        self.retired_indices = []
+        retired_ids = self.bird_id[retired]
+        self.fitness[retired_ids] = self.score[retired]
+        return retired_ids
+
+    def death_summary(self):
+        return ", ".join(f"{count} x {reason}" for reason, count in self.death_counts.items())
+
+    def jump(self, mask):
+        jumping = mask & self.can_jump
+        self.can_jump[jumping] = False
+        self.updates_since_last_jump[jumping] = 0
+        self.velocity[jumping] = self.params.jump_velocity
+
+    def jump_bird(self, index):
+        mask = np.zeros(len(self), dtype=bool)
+        mask[index] = True
+        self.jump(mask)
 
     def increse_bird_score(self, increment):
         self.score += increment
     
     def physics_update(self):
-        self.velocity -= self.gravity * (self.engine_interval_ms / 1000)
-        self.velocity = max(self.velocity, self.max_falling_speed)
+        params = self.params
+        self.velocity -= params.gravity * (params.engine_interval_ms / 1000)
+        np.maximum(self.velocity, params.max_falling_speed, out=self.velocity)
         
         self.bird_y += self.velocity
         self.updates_since_last_jump += 1
-        
-        #print(f"Bird {self.canvas_id}: ({round(self.bird_x, 4)}, {round(self.bird_y, 4)}), velocity: {round(self.velocity, 4)}")
 
         # Make jump avaliable again if enough time passed
-        if not self.can_jump:
-            if self.updates_since_last_jump > self.updates_between_jumps:
-                #print("Jump avaliable")
-                self.can_jump = True
-    
-    
-    def graphics_update(self, canvas):
-        if self.canvas_id == None:
-            self.canvas_id = canvas.create_image(self.canvas_width - self.bird_x * self.canvas_width - self.bird_width_px / 2,
-                                                 self.canvas_height - self.bird_y * self.canvas_height - self.bird_width_px / 2,
-                                                 anchor="center",
-                                                 image=self.bird_image)
-        canvas.moveto(self.canvas_id,
-                      self.canvas_width - self.bird_x * self.canvas_width - self.bird_width_px / 2,
-                      self.canvas_height - self.bird_y * self.canvas_height - self.bird_width_px / 2)
+        self.can_jump |= self.updates_since_last_jump > params.updates_between_jumps
 
+    def keep_only(self, indices):
+        # drops all birds except the ones on given indices
+        self.bird_id = self.bird_id[indices]
+        self.world = self.world[indices]
+        self.velocity = self.velocity[indices]
+        self.updates_since_last_jump = self.updates_since_last_jump[indices]
+        self.score = self.score[indices]
+        self.can_jump = self.can_jump[indices]
+        self.bird_y = self.bird_y[indices]
+        self.alive = self.alive[indices]
 
 
 def check_collision_circle_rectangle(circle_center, circle_radius, rectangle_top_left, rectangle_dim):
@@ -477,7 +1076,7 @@ def check_collision_circle_rectangle(circle_center, circle_radius, rectangle_top
 
     Arguments:
     circle_center: list
-        X,Y-coordinates of the circle center [x, y]
+        X,Y-coordinates of the circle center [x, y] (coordinates can be numpy arrays to check many circles at once)
     circle_radius: float
         Radius of the circle
     rectangle_top_left: list
@@ -486,27 +1085,126 @@ def check_collision_circle_rectangle(circle_center, circle_radius, rectangle_top
         Dimensions of rectangle [widht, height]
 
     Returns:
-        bool: True if the circle and rectangle collide, False otherwise
+        bool: True if the circle and rectangle collide, False otherwise (bool array for array coordinates)
     """
 
     # Find the closest point to the circle within the rectangle
-    closest_x = max(rectangle_top_left[0], min(circle_center[0], rectangle_top_left[0] + rectangle_dim[0]))
-    closest_y = min(rectangle_top_left[1], max(circle_center[1], rectangle_top_left[1] + rectangle_dim[1]))
+    closest_x = np.maximum(rectangle_top_left[0], np.minimum(circle_center[0], rectangle_top_left[0] + rectangle_dim[0]))
+    closest_y = np.minimum(rectangle_top_left[1], np.maximum(circle_center[1], rectangle_top_left[1] + rectangle_dim[1]))
 
     # Calculate the distance between the closest point and the circle's center
-    distance = sqrt((closest_x - circle_center[0]) ** 2 + (closest_y - circle_center[1]) ** 2)
+    distance = np.sqrt((closest_x - circle_center[0]) ** 2 + (closest_y - circle_center[1]) ** 2)
 
     # If the distance is less than the circle's radius, they collide
-    if distance < circle_radius:
-        return True
-    else:
-        return False
-
-
-
-def run_neat():
-    
-    app = App()
+    return distance < circle_radius
+
+
+
+def play_headless_game(genomes, config, seed, replay_path = None, budget = None, evaluation = None, tick_metrics = False, physics = None):
+    # runs in worker process - genomes are copies, so only their fitness (and statistics of the game) is sent back
+    game = Game(ENGINE_INTERVAL_MS, genomes, config, seed=seed, budget=budget, evaluation=evaluation, physics=physics)
+    if replay_path != None:
+        recorder = ReplayRecorder(replay_path)
+        game.add_observer(recorder)
+    if tick_metrics:
+        metrics = TickMetrics()
+        game.add_observer(metrics)
+    try:
+        game.run()
+    finally:
+        if replay_path != None:
+            recorder.close()
+
+    stats = game.stats()
+    if tick_metrics:
+        stats["tick_alive"] = metrics.alive
+        stats["tick_best_score"] = metrics.best_score
+    return [genome.fitness for genome_id, genome in genomes], stats
+
+
+class HeadlessEvaluator():
+    # Fitness function for NEAT - plays each generation without any window as fast as CPU allows
+
+    def __init__(self, seed = None, fixed_course = False, replay_dir = None, budget = None, evaluation = None, tick_metrics = False, physics = None):
+        self.random = Random(seed) # generates seed of pillars for each generation
+        self.budget = budget
+        self.physics = physics # overrides of GameParameters
+        self.evaluation = evaluation # courses played by each genome (see CourseEvaluation)
+        self.tick_metrics = tick_metrics # living birds and the best score are collected after every tick
+        self.game_stats = None # statistics of the last generation (read by TelemetryReporter)
+        self.generation = 0
+        self.replay_dir = replay_dir # when given, every generation is recorded for replay.py
+        # with fixed course every generation plays the same track
+        self.fixed_course = fixed_course
+        self.course_seed = seed if seed != None else self.random.getrandbits(32)
+
+    def next_course_seed(self):
+        if self.fixed_course:
+            return self.course_seed
+        return self.random.getrandbits(32)
+
+    def replay_path(self, part = None):
+        if self.replay_dir == None:
+            return None
+        suffix = "" if part == None else f"_part{part}"
+        return os.path.join(self.replay_dir, f"generation_{self.generation}{suffix}.replay")
+
+    def evaluate(self, genomes, config):
+        fitnesses, self.game_stats = play_headless_game(genomes, config, self.next_course_seed(), self.replay_path(), self.budget, self.evaluation, self.tick_metrics, self.physics)
+        self.generation += 1
+
+    def close(self):
+        pass
+
+
+class ParallelHeadlessEvaluator(HeadlessEvaluator):
+    # Splits genomes of a generation between worker processes. Each worker plays its part of the population
+    # in its own headless Game. Birds do not affect each other and all workers get the same seed,
+    # so the result is the same as if the whole generation was played in one game.
+
+    def __init__(self, num_workers, seed = None, fixed_course = False, replay_dir = None, budget = None, evaluation = None, tick_metrics = False, physics = None):
+        super().__init__(seed, fixed_course, replay_dir, budget, evaluation, tick_metrics, physics)
+        self.num_workers = num_workers
+        self.pool = multiprocessing.Pool(num_workers)
+
+    def evaluate(self, genomes, config):
+        generation_seed = self.next_course_seed()
+
+        chunk_size = ceil(len(genomes) / self.num_workers)
+        chunks = [genomes[i:i + chunk_size] for i in range(0, len(genomes), chunk_size)]
+
+        results = self.pool.starmap(play_headless_game, [(chunk, config, generation_seed, self.replay_path(i), self.budget, self.evaluation, self.tick_metrics, self.physics) for i, chunk in enumerate(chunks)])
+        self.generation += 1
+
+        for chunk, (fitnesses, stats) in zip(chunks, results):
+            for (genome_id, genome), fitness in zip(chunk, fitnesses):
+                genome.fitness = fitness
+        self.game_stats = merge_game_stats([stats for fitnesses, stats in results])
+
+    def close(self):
+        self.pool.close()
+        self.pool.join()
+
+
+def parse_physics(assignments):
+    # ["gravity=0.08", ...] -> {"gravity": 0.08, ...}
+    physics = {}
+    for assignment in assignments:
+        name, separator, value = assignment.partition("=")
+        if separator == "" or name not in GameParameters.TUNABLE:
+            raise ValueError(f"Invalid physics constant '{assignment}', use NAME=VALUE with one of: {', '.join(GameParameters.TUNABLE)}")
+        physics[name] = float(value)
+    return physics
+
+
+def run_neat(headless = False, generations = 20, workers = 1, seed = None, fixed_course = False, speed = "1x", profile_csv_path = None, max_drawn_birds = 200, replay_dir = None,
+             max_ticks = None, max_pillars = None, top_k = None, checkpoint_dir = "checkpoints", resume = None, keep_checkpoints = 5,
+             full_checkpoint_every = 1, export_path = "champion.npz", num_courses = 1, fitness_aggregation = "mean",
+             telemetry_path = None, telemetry_ticks = False, physics = None):
+
+    from checkpoint import CheckpointStore
+    from policy import export_genome
+    from telemetry import TelemetryReporter
 
     local_dir = os.path.dirname(__file__)
     config_path = os.path.join(local_dir, 'config.txt')
@@ -515,27 +1213,88 @@ def run_neat():
                             neat.DefaultSpeciesSet, neat.DefaultStagnation,
                             config_path)
 
-    p = neat.Population(config)
-
-    # In case I want to restart from checkpoint
-    #p = neat.Checkpointer.restore_checkpoint("neat-checkpoint-1")
+    # with "max" criterion NEAT stops once a single genome reaches the threshold, so there is no reason to play longer
+    fitness_threshold = config.fitness_threshold if config.fitness_criterion == "max" else None
+    budget = EvaluationBudget(max_ticks, max_pillars, fitness_threshold, top_k)
+    evaluation = CourseEvaluation(num_courses, fitness_aggregation)
+    if top_k != None and (max_ticks == None or num_courses < 2):
+        # with a single course all living birds have the same score, so none of them can be pruned
+        raise ValueError("--top-k needs --max-ticks and --courses of at least 2")
+    
+    evaluator = None
+    if workers > 1:
+        evaluator = ParallelHeadlessEvaluator(workers, seed, fixed_course, replay_dir, budget, evaluation, telemetry_ticks, physics)
+        fitness_function = evaluator.evaluate
+        stats_source = evaluator
+    elif headless:
+        evaluator = HeadlessEvaluator(seed, fixed_course, replay_dir, budget, evaluation, telemetry_ticks, physics)
+        fitness_function = evaluator.evaluate
+        stats_source = evaluator
+    else:
+        app = App(speed, profile_csv_path, max_drawn_birds, budget, physics)
+        fitness_function = app.start_flappy_bird
+        stats_source = app
+
+    # snapshot is saved after every generation, resume continues from the latest one or from the best one
+    checkpoints = CheckpointStore(checkpoint_dir, keep_last=keep_checkpoints, full_every=full_checkpoint_every)
+    if resume != None:
+        p = checkpoints.restore(config, resume)
+        print(f"Resumed from checkpoint of generation {p.generation}")
+    else:
+        p = neat.Population(config)
+        checkpoints.attach(p)
 
     p.add_reporter(neat.StdOutReporter(True))
-    stast = neat.StatisticsReporter()
-    p.add_reporter(stast)
-    p.add_reporter(neat.Checkpointer(generation_interval=1)) # after how many generations is checkpoint created
+    if telemetry_path != None:
+        p.add_reporter(TelemetryReporter(telemetry_path, stats_source))
 
     # Returns best genome after 'n' generations or when fitness hits treshold (default 400?)
-    winner = p.run(app.start_flappy_bird, n=20)
+    try:
+        winner = p.run(fitness_function, n=generations)
+    finally:
+        if evaluator != None:
+            evaluator.close()
+
+    # best genome is exported as standalone policy (loaded by policy.py without neat)
+    if export_path: # None or "" = no export
+        export_genome(winner, config, export_path)
+        print(f"Best genome (fitness {winner.fitness}) exported to {export_path}")
+
+
+def main(argv = None, prog = None):
+    # command line of game.py (also used by cli.py train/watch)
+    parser = argparse.ArgumentParser(prog=prog, description="Flappy bird AI trained by NEAT")
+    parser.add_argument("--headless", action="store_true", help="train without window (no tkinter needed), as fast as possible")
+    parser.add_argument("--generations", type=int, default=20, help="number of generations to train")
+    parser.add_argument("--workers", type=int, default=1, help="number of processes evaluating genomes (more than 1 implies --headless)")
+    parser.add_argument("--seed", type=int, default=None, help="seed of pillar heights (random when not given)")
+    parser.add_argument("--fixed-course", action="store_true", help="every generation plays the same pillars (given by --seed)")
+    parser.add_argument("--speed", choices=SPEED_OPTIONS.keys(), default="1x", help="initial speed of simulation when watching in window")
+    parser.add_argument("--profile-csv", default=None, help="CSV file where time spent in each phase is appended after every generation (window only)")
+    parser.add_argument("--max-drawn-birds", type=int, default=200, help="with more living birds only the best ones are drawn (window only)")
+    parser.add_argument("--record", default=None, metavar="DIR", help="records every generation of headless training into DIR (render with replay.py)")
+    parser.add_argument("--max-ticks", type=int, default=None, help="generation ends after this many engine ticks")
+    parser.add_argument("--max-pillars", type=int, default=None, help="generation ends after this many passed pillars")
+    parser.add_argument("--top-k", type=int, default=None, help="genomes which can't get into top k are retired early (needs --max-ticks and --courses 2 or more)")
+    parser.add_argument("--checkpoint-dir", default="checkpoints", help="directory where training state is saved after every generation")
+    parser.add_argument("--resume", default=None, metavar="WHICH", help="continue training from checkpoint: 'latest', 'best' or generation number")
+    parser.add_argument("--keep-checkpoints", type=int, default=5, help="number of the newest checkpoints kept on disk (the best ones are kept as well)")
+    parser.add_argument("--full-checkpoint-every", type=int, default=1, help="every n-th checkpoint stores all genomes, the others only changes against the previous one")
+    parser.add_argument("--export", default="champion.npz", metavar="FILE", help="file where the best genome is exported as standalone policy (see policy.py), empty string = no export")
+    parser.add_argument("--courses", type=int, default=1, help="number of courses played by every genome at once (headless)")
+    parser.add_argument("--fitness-aggregation", default="mean", help="fitness from more courses: mean, min or percentile like p25")
+    parser.add_argument("--telemetry", default=None, metavar="FILE", help="appends metrics of every generation to JSON lines file (follow it by telemetry.py)")
+    parser.add_argument("--telemetry-ticks", action="store_true", help="telemetry also contains living birds and the best score after every tick (headless)")
+    parser.add_argument("--physics", nargs="+", default=[], metavar="NAME=VALUE", help=f"changes game constant, one of: {', '.join(GameParameters.TUNABLE)}")
+    args = parser.parse_args(argv)
+
+    physics = parse_physics(args.physics)
+    run_neat(headless=args.headless, generations=args.generations, workers=args.workers, seed=args.seed, fixed_course=args.fixed_course, speed=args.speed, profile_csv_path=args.profile_csv, max_drawn_birds=args.max_drawn_birds, replay_dir=args.record,
+             max_ticks=args.max_ticks, max_pillars=args.max_pillars, top_k=args.top_k, checkpoint_dir=args.checkpoint_dir, resume=args.resume, keep_checkpoints=args.keep_checkpoints,
+             full_checkpoint_every=args.full_checkpoint_every, export_path=args.export,
+             num_courses=args.courses, fitness_aggregation=args.fitness_aggregation, telemetry_path=args.telemetry, telemetry_ticks=args.telemetry_ticks,
+             physics=physics)
 
 
 if __name__ == "__main__":
-    
-    run_neat()
-    #app = App()
-    #app.start_flappy_bird()
-
-    #app.engine_loop()
-    #app.draw_loop()
-
-    #app.root.mainloop()
+    main()
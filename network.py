@@ -0,0 +1,238 @@
+import numpy as np
+
+
+# numpy versions of NEAT activation functions (same clamping as in neat.activations)
+ACTIVATION_FUNCTIONS = {
+    "sigmoid": lambda z: 1.0 / (1.0 + np.exp(-np.clip(5.0 * z, -60.0, 60.0))),
+    "tanh": lambda z: np.tanh(np.clip(2.5 * z, -60.0, 60.0)),
+    "sin": lambda z: np.sin(np.clip(5.0 * z, -60.0, 60.0)),
+    "gauss": lambda z: np.exp(-5.0 * np.clip(z, -3.4, 3.4) ** 2),
+    "relu": lambda z: np.maximum(z, 0.0),
+    "softplus": lambda z: 0.2 * np.log(1 + np.exp(np.clip(5.0 * z, -60.0, 60.0))),
+    "identity": lambda z: z,
+    "clamped": lambda z: np.clip(z, -1.0, 1.0),
+    "exp": lambda z: np.exp(np.clip(z, -60.0, 60.0)),
+    "abs": lambda z: np.abs(z),
+    "hat": lambda z: np.maximum(0.0, 1 - np.abs(z)),
+    "square": lambda z: z ** 2,
+    "cube": lambda z: z ** 3,
+}
+ACTIVATION_NAMES = list(ACTIVATION_FUNCTIONS) # index in this list is used as activation code in arrays
+NETWORK_FILE_VERSION = 1
+
+
+def apply_activation(z, codes, used_codes = None):
+    # applies activation function given by code of each node (last axis of z)
+    if used_codes is None:
+        used_codes = np.unique(codes)
+    if len(used_codes) == 1:
+        return ACTIVATION_FUNCTIONS[ACTIVATION_NAMES[used_codes[0]]](z)
+
+    result = np.empty_like(z)
+    for code in used_codes:
+        mask = np.broadcast_to(codes == code, z.shape)
+        result[mask] = ACTIVATION_FUNCTIONS[ACTIVATION_NAMES[code]](z[mask])
+    return result
+
+
+class CompiledNetwork():
+    # Array form of neat.nn.FeedForwardNetwork. Values of all nodes are stored in "slots" - inputs take
+    # the first slots, followed by evaluated nodes in topological order. Nodes with the same layer
+    # only depend on nodes from lower layers, so the whole layer is computed as one matrix product.
+
+    def __init__(self, num_inputs, num_slots, node_slot, node_layer, weights, bias, response, activation, output_slots):
+        self.num_inputs = num_inputs
+        self.num_slots = num_slots
+        self.node_slot = node_slot # slot where the value of node is stored
+        self.node_layer = node_layer # 1 = depends only on inputs
+        self.weights = weights # shape (nodes, slots) - weight of link from slot to node
+        self.bias = bias
+        self.response = response
+        self.activation = activation # codes from ACTIVATION_NAMES
+        self.output_slots = output_slots
+
+        # arrays of each layer selected once, so activate does no masking
+        self.layers = []
+        for layer in range(1, self.num_layers + 1):
+            nodes = np.flatnonzero(node_layer == layer)
+            self.layers.append((weights[nodes].T.copy(), bias[nodes], response[nodes], activation[nodes],
+                                np.unique(activation[nodes]), node_slot[nodes]))
+
+    @property
+    def num_layers(self):
+        return int(self.node_layer.max()) if len(self.node_layer) > 0 else 0
+
+    @staticmethod
+    def create(net):
+        """
+        Compiles network created by neat.nn.FeedForwardNetwork.create into arrays.
+
+        Arguments:
+        net: neat.nn.FeedForwardNetwork
+            Network to compile (only "sum" aggregation is supported)
+
+        Returns:
+            CompiledNetwork: network giving the same outputs as net.activate
+        """
+
+        slots = {key: i for i, key in enumerate(net.input_nodes)}
+        depth = {key: 0 for key in net.input_nodes}
+
+        for node, act_func, agg_func, bias, response, links in net.node_evals:
+            if agg_func.__name__ != "sum_aggregation":
+                raise ValueError(f"Unsupported aggregation function: {agg_func.__name__}")
+            # nodes that are never evaluated keep value 0 (same as in FeedForwardNetwork.values)
+            for i, w in links:
+                if i not in slots:
+                    slots[i] = len(slots)
+                    depth[i] = 0
+            depth[node] = 1 + max([depth[i] for i, w in links], default=0)
+            slots[node] = len(slots)
+
+        for key in net.output_nodes:
+            if key not in slots:
+                slots[key] = len(slots)
+
+        num_nodes = len(net.node_evals)
+        num_slots = len(slots)
+        weights = np.zeros((num_nodes, num_slots))
+        node_slot = np.zeros(num_nodes, dtype=np.int64)
+        node_layer = np.zeros(num_nodes, dtype=np.int64)
+        bias = np.zeros(num_nodes)
+        response = np.zeros(num_nodes)
+        activation = np.zeros(num_nodes, dtype=np.int64)
+
+        for n, (node, act_func, agg_func, node_bias, node_response, links) in enumerate(net.node_evals):
+            name = act_func.__name__.replace("_activation", "")
+            if name not in ACTIVATION_FUNCTIONS:
+                raise ValueError(f"Unsupported activation function: {act_func.__name__}")
+
+            node_slot[n] = slots[node]
+            node_layer[n] = depth[node]
+            bias[n] = node_bias
+            response[n] = node_response
+            activation[n] = ACTIVATION_NAMES.index(name)
+            for i, w in links:
+                weights[n, slots[i]] += w
+
+        output_slots = np.array([slots[key] for key in net.output_nodes], dtype=np.int64)
+
+        return CompiledNetwork(len(net.input_nodes), num_slots, node_slot, node_layer, weights, bias, response, activation, output_slots)
+
+    def activate(self, inputs):
+        # inputs of shape (batch, inputs), returns outputs of shape (batch, outputs)
+        inputs = np.asarray(inputs, dtype=float)
+        values = np.zeros((len(inputs), self.num_slots))
+        values[:, :self.num_inputs] = inputs
+
+        for weights, bias, response, activation, used_activations, slots in self.layers:
+            z = bias + response * (values @ weights)
+            values[:, slots] = apply_activation(z, activation, used_activations)
+
+        return values[:, self.output_slots]
+
+    def save(self, path):
+        # standalone .npz file, loading it needs only numpy (activations are stored by name)
+        np.savez_compressed(path, version=NETWORK_FILE_VERSION, num_inputs=self.num_inputs, num_slots=self.num_slots,
+                            node_slot=self.node_slot, node_layer=self.node_layer, weights=self.weights, bias=self.bias,
+                            response=self.response, activation=np.array(ACTIVATION_NAMES)[self.activation],
+                            output_slots=self.output_slots)
+
+    @staticmethod
+    def load(path):
+        with np.load(path) as data:
+            if int(data["version"]) != NETWORK_FILE_VERSION:
+                raise ValueError(f"{path} has unsupported network file version {int(data['version'])}")
+            activation = np.array([ACTIVATION_NAMES.index(name) for name in data["activation"].tolist()], dtype=np.int64)
+            return CompiledNetwork(int(data["num_inputs"]), int(data["num_slots"]), data["node_slot"], data["node_layer"],
+                                   data["weights"], data["bias"], data["response"], activation, data["output_slots"])
+
+
+class PopulationNetwork():
+    # Networks of the whole population padded to the same shape and evaluated together, where
+    # each network gets its own row of inputs. Layer "l" of all networks is computed as one
+    # batched matrix product, so cost of a tick does not depend on number of Python objects.
+
+    def __init__(self, compiled_networks):
+
+        self.size = len(compiled_networks)
+        self.num_inputs = compiled_networks[0].num_inputs if self.size > 0 else 0
+        self.num_outputs = len(compiled_networks[0].output_slots) if self.size > 0 else 0
+
+        num_slots = max([net.num_slots for net in compiled_networks], default=0)
+        self.scratch_slot = num_slots # padding nodes write their (meaningless) value here
+        self.num_slots = num_slots + 1
+        num_layers = max([net.num_layers for net in compiled_networks], default=0)
+
+        self.output_slots = np.zeros((self.size, self.num_outputs), dtype=np.int64)
+
+        # per layer arrays of shape (population, nodes in layer, ...)
+        self.layer_weights = []
+        self.layer_bias = []
+        self.layer_response = []
+        self.layer_activation = []
+        self.layer_slot = []
+        self.layer_used_activations = []
+
+        for layer in range(1, num_layers + 1):
+            layer_nodes = [np.flatnonzero(net.node_layer == layer) for net in compiled_networks]
+            width = max(len(nodes) for nodes in layer_nodes)
+
+            weights = np.zeros((self.size, width, self.num_slots))
+            bias = np.zeros((self.size, width))
+            response = np.zeros((self.size, width))
+            activation = np.full((self.size, width), ACTIVATION_NAMES.index("identity"), dtype=np.int64)
+            slot = np.full((self.size, width), self.scratch_slot, dtype=np.int64)
+
+            for p, (net, nodes) in enumerate(zip(compiled_networks, layer_nodes)):
+                k = len(nodes)
+                weights[p, :k, :net.num_slots] = net.weights[nodes]
+                bias[p, :k] = net.bias[nodes]
+                response[p, :k] = net.response[nodes]
+                activation[p, :k] = net.activation[nodes]
+                slot[p, :k] = net.node_slot[nodes]
+
+            # padding nodes use activation of real node so layer keeps single activation when possible
+            activation[slot == self.scratch_slot] = activation[slot != self.scratch_slot][0]
+
+            self.layer_weights.append(weights)
+            self.layer_bias.append(bias)
+            self.layer_response.append(response)
+            self.layer_activation.append(activation)
+            self.layer_slot.append(slot)
+            self.layer_used_activations.append(np.unique(activation))
+
+        for p, net in enumerate(compiled_networks):
+            self.output_slots[p] = net.output_slots
+
+    @staticmethod
+    def create(networks):
+        # networks created by neat.nn.FeedForwardNetwork.create
+        return PopulationNetwork([CompiledNetwork.create(net) for net in networks])
+
+    def __len__(self):
+        return self.size
+
+    def activate(self, inputs):
+        # inputs of shape (population, inputs) - row "p" is fed into network "p"
+        # returns outputs of shape (population, outputs)
+        values = np.zeros((self.size, self.num_slots))
+        values[:, :self.num_inputs] = inputs
+        rows = np.arange(self.size)[:, None]
+
+        for l, weights in enumerate(self.layer_weights):
+            z = self.layer_bias[l] + self.layer_response[l] * np.matmul(weights, values[:, :, None])[:, :, 0]
+            values[rows, self.layer_slot[l]] = apply_activation(z, self.layer_activation[l], self.layer_used_activations[l])
+
+        return values[rows, self.output_slots]
+
+    def keep_only(self, indices):
+        # drops all networks except the ones on given indices (same as BirdPopulation.keep_only)
+        self.size = len(indices)
+        self.output_slots = self.output_slots[indices]
+        self.layer_weights = [array[indices] for array in self.layer_weights]
+        self.layer_bias = [array[indices] for array in self.layer_bias]
+        self.layer_response = [array[indices] for array in self.layer_response]
+        self.layer_activation = [array[indices] for array in self.layer_activation]
+        self.layer_slot = [array[indices] for array in self.layer_slot]
+        self.layer_used_activations = [np.unique(array) for array in self.layer_activation]
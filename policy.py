@@ -0,0 +1,153 @@
+import os
+import struct
+import socket
+import argparse
+import socketserver
+import numpy as np
+from network import CompiledNetwork
+
+
+# Trained policy (champion genome) exported as CompiledNetwork file - it is loaded without neat.
+#
+# Socket protocol (all little-endian):
+#   server -> client after connecting: number of inputs (uint32)
+#   client -> server: number of observations n (uint32), then n * inputs observations (float64)
+#   server -> client: n decisions (uint8, 1 = jump)
+# Connection is closed by the client, or by sending n = 0.
+JUMP_THRESHOLD = 0.5 # same as Game.make_AI_decision
+COUNT = struct.Struct("<I")
+
+
+def export_genome(genome, config, path):
+    # compiles genome (e.g. winner of the training) into standalone policy file
+    import neat
+    CompiledNetwork.create(neat.nn.FeedForwardNetwork.create(genome, config)).save(path)
+
+
+class Policy():
+    # In-process inference - decides for a batch of observations at once, e.g. for many games driven by one policy.
+
+    def __init__(self, network):
+        self.network = network
+        self.num_inputs = network.num_inputs
+
+    @staticmethod
+    def load(path):
+        return Policy(CompiledNetwork.load(path))
+
+    def decide(self, observations):
+        # observations of shape (n, inputs) - same inputs as Game.AI_inputs, returns bool array (True = jump)
+        return self.network.activate(observations)[:, 0] > JUMP_THRESHOLD
+
+
+class PolicyRequestHandler(socketserver.StreamRequestHandler):
+
+    def setup(self):
+        super().setup()
+        if self.request.family != socket.AF_UNIX:
+            self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def handle(self):
+        policy = self.server.policy
+        self.wfile.write(COUNT.pack(policy.num_inputs))
+        self.wfile.flush()
+
+        while True:
+            header = self.rfile.read(COUNT.size)
+            if len(header) < COUNT.size:
+                return
+            n, = COUNT.unpack(header)
+            if n == 0:
+                return
+            data = self.rfile.read(n * policy.num_inputs * 8)
+            if len(data) < n * policy.num_inputs * 8: # client disconnected in the middle of request
+                return
+            observations = np.frombuffer(data, dtype="<f8").reshape(n, policy.num_inputs)
+            self.wfile.write(policy.decide(observations).astype(np.uint8).tobytes())
+            self.wfile.flush()
+
+
+class PolicyTCPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class PolicyUnixServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+
+def create_server(policy, address):
+    """
+    Creates server answering decisions of policy over local socket (serve_forever starts it).
+
+    Arguments:
+    policy: Policy
+        Policy used for all connections
+    address: str
+        "host:port" for TCP, otherwise path of unix socket
+
+    Returns:
+        socketserver.BaseServer: server with bound socket
+    """
+
+    if ":" in address:
+        host, port = address.rsplit(":", 1)
+        server = PolicyTCPServer((host, int(port)), PolicyRequestHandler)
+    else:
+        if os.path.exists(address):
+            os.remove(address)
+        server = PolicyUnixServer(address, PolicyRequestHandler)
+    server.policy = policy
+    return server
+
+
+class PolicyClient():
+    # Client of policy server with the same decide method as Policy
+
+    def __init__(self, address):
+        if ":" in address:
+            host, port = address.rsplit(":", 1)
+            self.socket = socket.create_connection((host, int(port)))
+            self.socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        else:
+            self.socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.socket.connect(address)
+        self.num_inputs, = COUNT.unpack(self.receive(COUNT.size))
+
+    def receive(self, size):
+        data = bytearray()
+        while len(data) < size:
+            chunk = self.socket.recv(size - len(data))
+            if not chunk:
+                raise ConnectionError("Policy server closed connection")
+            data += chunk
+        return data
+
+    def decide(self, observations):
+        observations = np.ascontiguousarray(observations, dtype="<f8").reshape(-1, self.num_inputs)
+        self.socket.sendall(COUNT.pack(len(observations)) + observations.tobytes())
+        return np.frombuffer(self.receive(len(observations)), dtype=np.uint8).astype(bool)
+
+    def close(self):
+        self.socket.sendall(COUNT.pack(0))
+        self.socket.close()
+
+
+def main(argv = None, prog = None):
+    parser = argparse.ArgumentParser(prog=prog, description="Serves exported policy (game.py --export) over local socket")
+    parser.add_argument("policy", help="exported policy file (.npz)")
+    parser.add_argument("--address", default="127.0.0.1:5005", help="'host:port' for TCP, otherwise path of unix socket")
+    args = parser.parse_args(argv)
+
+    server = create_server(Policy.load(args.policy), args.address)
+    print(f"Serving {args.policy} on {args.address}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
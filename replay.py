@@ -0,0 +1,211 @@
+import os
+import glob
+import gzip
+import zlib
+import struct
+import argparse
+import multiprocessing
+import numpy as np
+# PIL is imported only by rendering functions, so ReplayRecorder (used in training workers) doesn't load it
+
+
+# Replay log = gzip compressed binary file:
+#   header - REPLAY_HEADER (sizes of the game needed to draw it again)
+#   then one record per engine tick:
+#     number of living birds (uint32)
+#     alive mask of all birds of the generation (bits packed by numpy.packbits, indexed by bird ID)
+#     y-coordinates of living birds (float16, ordered by bird ID)
+#     x and y center of each pillar (float32)
+REPLAY_MAGIC = b"FBRP"
+REPLAY_VERSION = 1
+REPLAY_HEADER = struct.Struct("<4sHIHHHHHHfff")
+TICK_HEADER = struct.Struct("<I")
+
+
+class ReplayRecorder():
+    # Observer of Game (see Game.observers), which stores state of birds and pillars after every tick.
+    # Every tick is written to the compressed stream right away (gzip buffers it), so memory does not grow
+    # with length of the game and a crashed game leaves the ticks played so far.
+    # When more courses are played at once, only the first world is recorded.
+
+    def __init__(self, path):
+        self.path = path
+        self.file = None
+        self.num_birds = None
+
+    def start(self, game):
+        params = game.params
+        self.num_birds = len(game.genome_instances)
+        directory = os.path.dirname(self.path)
+        if directory != "":
+            os.makedirs(directory, exist_ok=True)
+        self.file = gzip.open(self.path, "wb", compresslevel=1)
+        self.file.write(REPLAY_HEADER.pack(REPLAY_MAGIC, REPLAY_VERSION,
+                                         self.num_birds,
+                                         len(game.pillar_instances),
+                                         params.canvas_width,
+                                         params.canvas_height,
+                                         params.bird_size_px,
+                                         params.pillar_width,
+                                         params.pillar_body_height,
+                                         params.engine_interval_ms,
+                                         params.pillar_gap_size,
+                                         params.bird_x))
+
+    def on_tick(self, game):
+        birds = game.birds
+        recorded = birds.alive & (birds.world == 0)
+        alive_mask = np.zeros(self.num_birds, dtype=bool)
+        alive_mask[birds.bird_id[recorded]] = True
+        pillars = np.array([pillar.center_position for pillar in game.pillar_instances], dtype=np.float32)
+
+        self.file.write(TICK_HEADER.pack(int(alive_mask.sum())) +
+                        np.packbits(alive_mask).tobytes() +
+                        birds.bird_y[recorded].astype(np.float16).tobytes() +
+                        pillars.tobytes())
+
+    def close(self):
+        if self.file != None:
+            self.file.close()
+            self.file = None
+
+
+class ReplayLog():
+    # Replay loaded from one or more files. Generation played in parallel workers is stored in one
+    # file per worker ("parts") - birds of all parts are merged, as all of them played the same course.
+
+    def __init__(self, paths):
+        self.ticks = [] # (y-coordinates of living birds, pillar centers) for each tick
+        parts = [self.read(path) for path in paths]
+
+        for tick in range(max(len(part) for part in parts)):
+            bird_y = [part[tick][0] for part in parts if tick < len(part)]
+            # pillars are the same for all parts, the longest running part has them for every tick
+            pillars = next(part[tick][1] for part in parts if tick < len(part))
+            self.ticks.append((np.concatenate(bird_y), pillars))
+
+    @staticmethod
+    def load(path):
+        # path of a single file, or of the first part ("..._part0.replay") to load all parts
+        if path.endswith("_part0.replay"):
+            return ReplayLog(sorted(glob.glob(path.replace("_part0.replay", "_part*.replay"))))
+        return ReplayLog([path])
+
+    def read(self, path):
+        # decompressed without gzip.open, which refuses file of a crashed game (no end of stream)
+        with open(path, "rb") as f:
+            data = zlib.decompressobj(wbits=16 + zlib.MAX_WBITS).decompress(f.read())
+
+        (magic, version, num_birds, num_pillars, self.canvas_width, self.canvas_height, self.bird_size_px,
+         self.pillar_width, self.pillar_body_height, self.engine_interval_ms, self.gap_size, self.bird_x) = REPLAY_HEADER.unpack_from(data, 0)
+        if magic != REPLAY_MAGIC or version != REPLAY_VERSION:
+            raise ValueError(f"{path} is not a replay file (version {REPLAY_VERSION})")
+
+        mask_size = (num_birds + 7) // 8
+        pillars_size = num_pillars * 2 * 4
+        offset = REPLAY_HEADER.size
+        ticks = []
+        while offset + TICK_HEADER.size <= len(data):
+            alive_count, = TICK_HEADER.unpack_from(data, offset)
+            if offset + TICK_HEADER.size + mask_size + alive_count * 2 + pillars_size > len(data):
+                break # tick cut off by crash
+            offset += TICK_HEADER.size + mask_size # alive mask is not needed for drawing
+            bird_y = np.frombuffer(data, dtype=np.float16, count=alive_count, offset=offset).astype(float)
+            offset += alive_count * 2
+            pillars = np.frombuffer(data, dtype=np.float32, count=num_pillars * 2, offset=offset).reshape(num_pillars, 2)
+            offset += pillars_size
+            ticks.append((bird_y, pillars))
+        return ticks
+
+
+# images used by rendering worker process, loaded once per process
+worker_images = None
+
+
+def load_images(bird_size_px, pillar_width, pillar_body_height):
+    global worker_images
+    from PIL import Image
+    body = Image.open("pillar_body.png").convert("RGBA").resize((pillar_width, pillar_body_height), Image.Resampling.LANCZOS)
+    head = Image.open("pillar_head.png").convert("RGBA").resize((pillar_width, pillar_width), Image.Resampling.LANCZOS)
+    worker_images = {
+        "bird": Image.open("bird.png").convert("RGBA").resize((bird_size_px, bird_size_px), Image.Resampling.LANCZOS),
+        "pillar_body_bottom": body,
+        "pillar_body_top": body.rotate(180),
+        "pillar_head_bottom": head,
+        "pillar_head_top": head.rotate(180)
+    }
+
+
+def render_frame(frame):
+    # same projection as TkRenderer, but composed by PIL
+    from PIL import Image
+    bird_y, pillars, sizes, max_birds = frame
+    canvas_width, canvas_height, bird_size_px, pillar_width, pillar_body_height, gap_size, bird_x = sizes
+    image = Image.new("RGB", (canvas_width, canvas_height), (0, 0, 0))
+
+    for center_x, center_y in pillars.tolist():
+        pillar_x = round(center_x * canvas_width - pillar_width / 2)
+        top_y = round(canvas_height - (center_y + gap_size / 2) * canvas_height)
+        bottom_y = round(canvas_height - (center_y - gap_size / 2) * canvas_height)
+        paste(image, worker_images["pillar_head_top"], pillar_x, top_y - pillar_width)
+        paste(image, worker_images["pillar_body_top"], pillar_x, top_y - pillar_width - pillar_body_height)
+        paste(image, worker_images["pillar_head_bottom"], pillar_x, bottom_y)
+        paste(image, worker_images["pillar_body_bottom"], pillar_x, bottom_y + pillar_width)
+
+    x = round(canvas_width - bird_x * canvas_width - bird_size_px / 2)
+    for y in bird_y[:max_birds].tolist():
+        paste(image, worker_images["bird"], x, round(canvas_height - y * canvas_height - bird_size_px / 2))
+
+    return image
+
+
+def paste(image, sprite, x, y):
+    # sprite is blended by its alpha channel (unlike alpha_composite, paste accepts positions out of image)
+    image.paste(sprite, (x, y), sprite)
+
+
+def render_replay(log, output_path, workers = 1, frame_step = 2, max_birds = 500):
+    """
+    Renders replay into GIF (output ending with .gif) or into directory of PNG frames (e.g. for ffmpeg to make MP4).
+
+    Arguments:
+    log: ReplayLog
+        Loaded replay
+    output_path: str
+        Path of GIF file or of directory for PNG frames
+    workers: int
+        Number of processes rendering frames
+    frame_step: int
+        Every n-th engine tick is rendered
+    max_birds: int
+        Maximal number of birds drawn in a frame
+    """
+
+    sizes = (log.canvas_width, log.canvas_height, log.bird_size_px, log.pillar_width, log.pillar_body_height, log.gap_size, log.bird_x)
+    frames = [(bird_y, pillars, sizes, max_birds) for bird_y, pillars in log.ticks[::frame_step]]
+
+    with multiprocessing.Pool(workers, initializer=load_images, initargs=(log.bird_size_px, log.pillar_width, log.pillar_body_height)) as pool:
+        images = pool.map(render_frame, frames, chunksize=max(1, len(frames) // (4 * workers)))
+
+    if output_path.endswith(".gif"):
+        images[0].save(output_path, save_all=True, append_images=images[1:], duration=round(log.engine_interval_ms * frame_step), loop=0)
+    else:
+        os.makedirs(output_path, exist_ok=True)
+        for i, image in enumerate(images):
+            image.save(os.path.join(output_path, f"frame_{i:05d}.png"))
+
+
+def main(argv = None, prog = None):
+    parser = argparse.ArgumentParser(prog=prog, description="Renders replay recorded during headless training (game.py --record)")
+    parser.add_argument("replay", help="replay file (first part '..._part0.replay' loads all parts of parallel run)")
+    parser.add_argument("--output", default="replay.gif", help="GIF file, or directory for PNG frames")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="number of rendering processes")
+    parser.add_argument("--frame-step", type=int, default=2, help="render every n-th tick")
+    parser.add_argument("--max-birds", type=int, default=500, help="maximal number of birds drawn in a frame")
+    args = parser.parse_args(argv)
+
+    render_replay(ReplayLog.load(args.replay), args.output, args.workers, args.frame_step, args.max_birds)
+
+
+if __name__ == "__main__":
+    main()
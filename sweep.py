@@ -0,0 +1,264 @@
+import os
+import csv
+import json
+import math
+import time
+import random
+import argparse
+import tempfile
+import itertools
+import contextlib
+import configparser
+import multiprocessing
+import neat
+from game import GameParameters, HeadlessEvaluator, EvaluationBudget, CourseEvaluation
+
+
+# Sweep spec = JSON file, e.g.:
+#   {"mode": "grid",                    grid = every combination, random = "samples" random combinations
+#    "generations": 50,                 maximal number of generations of one training
+#    "repeats": 3,                      trainings of every combination (with different seeds)
+#    "seed": 0,
+#    "parameters": {"neat.pop_size": [50, 100, 200],
+#                   "neat.conn_add_prob": {"min": 0.1, "max": 0.7},
+#                   "game.gravity": [0.08, 0.1]}}
+# "neat.NAME" is option of config.txt (found in whichever section has it), "game.NAME" is one of GameParameters.TUNABLE.
+# Values are lists (grid and random) or ranges {"min", "max", "log"} (random only, integers when both bounds are).
+RESULT_FIELDS = ["job", "repeat", "seed", "status", "reached_threshold", "time_to_threshold_s", "generations_to_threshold",
+                 "ticks_to_threshold", "generations", "generations_per_sec", "best_fitness", "ticks", "wall_time_s"]
+
+
+def sample_value(values, rng):
+    if isinstance(values, list):
+        return rng.choice(values)
+    low, high = values["min"], values["max"]
+    if values.get("log", False):
+        value = math.exp(rng.uniform(math.log(low), math.log(high)))
+    else:
+        value = rng.uniform(low, high)
+    return round(value) if isinstance(low, int) and isinstance(high, int) else value
+
+
+def expand_spec(spec):
+    """
+    Creates jobs (one training each) from sweep spec.
+
+    Arguments:
+    spec: dict
+        Loaded sweep spec (see top of this file)
+
+    Returns:
+        list: dictionaries with job number, repeat, seed and parameters of the training
+    """
+
+    parameters = spec["parameters"]
+    for name in parameters:
+        group, _, option = name.partition(".")
+        if group not in ("neat", "game") or option == "":
+            raise ValueError(f"Invalid sweep parameter '{name}', use 'neat.OPTION' or 'game.CONSTANT'")
+        if group == "game" and option not in GameParameters.TUNABLE:
+            raise ValueError(f"Invalid game constant '{option}', use one of: {', '.join(GameParameters.TUNABLE)}")
+
+    rng = random.Random(spec.get("seed", 0))
+    mode = spec.get("mode", "grid")
+    if mode == "grid":
+        ranges = [name for name, values in parameters.items() if not isinstance(values, list)]
+        if len(ranges) > 0:
+            raise ValueError(f"Grid sweep needs list of values, not range: {', '.join(ranges)}")
+        combinations = [dict(zip(parameters, values)) for values in itertools.product(*parameters.values())]
+    elif mode == "random":
+        combinations = [{name: sample_value(values, rng) for name, values in parameters.items()} for i in range(spec["samples"])]
+    else:
+        raise ValueError(f"Invalid sweep mode '{mode}', use grid or random")
+
+    jobs = []
+    for number, combination in enumerate(combinations):
+        for repeat in range(spec.get("repeats", 1)):
+            jobs.append({"job": number, "repeat": repeat, "seed": rng.getrandbits(32), "parameters": combination})
+    return jobs
+
+
+def write_neat_config(config_path, overrides):
+    # copy of config.txt with changed options, returns path of temporary file (deleted by caller)
+    parser = configparser.ConfigParser()
+    parser.read(config_path)
+    for option, value in overrides.items():
+        section = next((section for section in parser.sections() if parser.has_option(section, option)), None)
+        if section == None:
+            raise ValueError(f"Option '{option}' is not in {config_path}")
+        parser.set(section, option, str(value))
+
+    handle, path = tempfile.mkstemp(suffix=".txt", prefix="sweep_config_")
+    with os.fdopen(handle, "w") as f:
+        parser.write(f)
+    return path
+
+
+class SweepReporter(neat.reporting.BaseReporter):
+    # Measures when training reaches fitness threshold of the config
+
+    def __init__(self, fitness_threshold, evaluator):
+        self.fitness_threshold = fitness_threshold
+        self.evaluator = evaluator
+        self.start = time.perf_counter()
+        self.generations = 0
+        self.ticks = 0
+        self.best_fitness = None
+        self.time_to_threshold = None
+        self.generations_to_threshold = None
+        self.ticks_to_threshold = None
+
+    def post_evaluate(self, config, population, species, best_genome):
+        self.generations += 1
+        self.ticks += self.evaluator.game_stats["ticks"]
+        if self.best_fitness == None or best_genome.fitness > self.best_fitness:
+            self.best_fitness = best_genome.fitness
+        if self.time_to_threshold == None and best_genome.fitness >= self.fitness_threshold:
+            self.time_to_threshold = time.perf_counter() - self.start
+            self.generations_to_threshold = self.generations
+            self.ticks_to_threshold = self.ticks
+
+
+def run_job(job):
+    # runs in worker process - one whole training, single process (jobs are parallel, not genome evaluation)
+    settings = job["settings"]
+    neat_options = {name[len("neat."):]: value for name, value in job["parameters"].items() if name.startswith("neat.")}
+    physics = {name[len("game."):]: value for name, value in job["parameters"].items() if name.startswith("game.")}
+
+    config_path = write_neat_config(settings["config_path"], neat_options)
+    try:
+        config = neat.Config(neat.DefaultGenome, neat.DefaultReproduction,
+                             neat.DefaultSpeciesSet, neat.DefaultStagnation,
+                             config_path)
+    finally:
+        os.remove(config_path)
+
+    random.seed(job["seed"]) # NEAT uses global random
+    budget = EvaluationBudget(settings["max_ticks"], settings["max_pillars"], config.fitness_threshold, None)
+    evaluator = HeadlessEvaluator(job["seed"], budget=budget, evaluation=CourseEvaluation(), physics=physics)
+    reporter = SweepReporter(config.fitness_threshold, evaluator)
+    population = neat.Population(config)
+    population.add_reporter(reporter)
+
+    status = "ok"
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        try:
+            population.run(evaluator.evaluate, n=settings["generations"])
+        except neat.CompleteExtinctionException:
+            status = "extinct"
+        finally:
+            evaluator.close()
+    wall_time = time.perf_counter() - reporter.start
+
+    result = {"job": job["job"], "repeat": job["repeat"], "seed": job["seed"], "status": status,
+              "reached_threshold": reporter.time_to_threshold != None,
+              "time_to_threshold_s": reporter.time_to_threshold,
+              "generations_to_threshold": reporter.generations_to_threshold,
+              "ticks_to_threshold": reporter.ticks_to_threshold,
+              "generations": reporter.generations,
+              "generations_per_sec": reporter.generations / wall_time if wall_time > 0 else None,
+              "best_fitness": reporter.best_fitness,
+              "ticks": reporter.ticks,
+              "wall_time_s": wall_time}
+    result.update(job["parameters"])
+    return result
+
+
+def summarize(results, parameter_names):
+    # combinations ordered by mean time to threshold, the ones which did not always reach it are last
+    combinations = {}
+    for result in results:
+        combinations.setdefault(result["job"], []).append(result)
+
+    rows = []
+    for job, runs in combinations.items():
+        reached = [run for run in runs if run["reached_threshold"]]
+        mean_time = sum(run["time_to_threshold_s"] for run in reached) / len(reached) if len(reached) > 0 else None
+        mean_generations = sum(run["generations_to_threshold"] for run in reached) / len(reached) if len(reached) > 0 else None
+        rows.append((len(reached) < len(runs), math.inf if mean_time == None else mean_time, job, runs, len(reached), mean_generations))
+    rows.sort(key=lambda row: row[:3])
+
+    lines = []
+    for incomplete, mean_time, job, runs, reached, mean_generations in rows:
+        parameters = ", ".join(f"{name}={runs[0][name]}" for name in parameter_names)
+        speed = sum(run["generations_per_sec"] or 0 for run in runs) / len(runs)
+        if reached > 0:
+            text = f"{mean_time:8.2f} s {mean_generations:6.1f} gen"
+        else:
+            text = f"{'-':>8}   {'-':>6}    "
+        lines.append(f"job {job:3d}: {text}  reached {reached}/{len(runs)}  {speed:6.2f} gen/s  {parameters}")
+    return "\n".join(lines)
+
+
+def run_sweep(spec, output_path, workers = 1, config_path = None):
+    """
+    Runs all trainings of sweep spec, results are appended to CSV file as soon as each training finishes
+    (results of earlier sweeps into the same file are kept).
+
+    Arguments:
+    spec: dict
+        Loaded sweep spec (see top of this file)
+    output_path: str
+        CSV file with one row per training
+    workers: int
+        Number of trainings running at once
+    config_path: str
+        NEAT config the sweep changes (config.txt next to game.py when not given)
+
+    Returns:
+        list: result of every training
+    """
+
+    if config_path == None:
+        config_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "config.txt")
+    jobs = expand_spec(spec)
+    settings = {"config_path": config_path,
+                "generations": spec.get("generations", 50),
+                "max_ticks": spec.get("max_ticks"),
+                "max_pillars": spec.get("max_pillars")}
+    for job in jobs:
+        job["settings"] = settings
+    parameter_names = list(spec["parameters"])
+
+    directory = os.path.dirname(output_path)
+    if directory != "":
+        os.makedirs(directory, exist_ok=True)
+
+    # results of earlier sweeps are kept, they can only be extended by a sweep with the same columns
+    fields = RESULT_FIELDS + parameter_names
+    new_file = not os.path.exists(output_path) or os.path.getsize(output_path) == 0
+    if not new_file:
+        with open(output_path, newline="") as f:
+            header = next(csv.reader(f), [])
+        if header != fields:
+            raise ValueError(f"{output_path} has results with different parameters ({', '.join(header[len(RESULT_FIELDS):])}), use another output file")
+
+    results = []
+    with open(output_path, "a", newline="") as f, multiprocessing.Pool(workers) as pool:
+        writer = csv.DictWriter(f, fieldnames=fields)
+        if new_file:
+            writer.writeheader()
+        # job queue - each worker takes the next training once its previous one is finished
+        for result in pool.imap_unordered(run_job, jobs):
+            writer.writerow(result)
+            f.flush()
+            results.append(result)
+            print(f"[{len(results)}/{len(jobs)}] job {result['job']} repeat {result['repeat']}: best fitness {result['best_fitness']:.2f}, "
+                  f"{result['generations']} generations in {result['wall_time_s']:.1f} s", flush=True)
+
+    print(summarize(results, parameter_names))
+    return results
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Sweep of NEAT config and game physics - runs headless trainings in parallel")
+    parser.add_argument("spec", help="JSON file with sweep spec (see sweep.py)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="number of trainings running at once")
+    parser.add_argument("--output", default="sweep_results.csv", help="CSV file with result of every training (appended)")
+    parser.add_argument("--config", default=None, help="NEAT config changed by the sweep (config.txt when not given)")
+    args = parser.parse_args()
+
+    with open(args.spec) as f:
+        spec = json.load(f)
+    run_sweep(spec, args.output, args.workers, args.config)
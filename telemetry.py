@@ -0,0 +1,239 @@
+import os
+import json
+import time
+import argparse
+import numpy as np
+import neat
+
+
+# Telemetry file = JSON lines appended during training, one record per line:
+#   {"type": "generation", ...} - fitness distribution, species, speed of the engine and deaths of one generation
+#   {"type": "tick", ...} - number of living birds and the best score after each engine tick (optional)
+FITNESS_HISTOGRAM_BINS = 10
+
+
+class TickMetrics():
+    # Observer of Game (see Game.observers) counting living birds and the best score after every tick.
+    # Values are only appended to lists, they are written by TelemetryReporter after the generation.
+
+    def __init__(self):
+        self.alive = []
+        self.best_score = []
+
+    def start(self, game):
+        pass
+
+    def on_tick(self, game):
+        birds = game.birds
+        self.alive.append(birds.num_alive)
+        self.best_score.append(float(birds.score.max(where=birds.alive, initial=-np.inf)) if birds.num_alive > 0 else None)
+
+
+def merge_game_stats(parts):
+    # statistics of games which played parts of the same generation (see Game.stats)
+    merged = {"ticks": max(part["ticks"] for part in parts),
+              "pillars": max(part["pillars"] for part in parts),
+              "deaths": {}}
+    for part in parts:
+        for reason, count in part["deaths"].items():
+            merged["deaths"][reason] = merged["deaths"].get(reason, 0) + count
+
+    if all("tick_alive" in part for part in parts):
+        ticks = merged["ticks"]
+        alive = np.zeros(ticks, dtype=np.int64)
+        best_score = [None] * ticks
+        for part in parts:
+            alive[:len(part["tick_alive"])] += part["tick_alive"]
+            for tick, score in enumerate(part["tick_best_score"]):
+                if score != None and (best_score[tick] == None or score > best_score[tick]):
+                    best_score[tick] = score
+        merged["tick_alive"] = alive.tolist()
+        merged["tick_best_score"] = best_score
+    return merged
+
+
+class TelemetryReporter(neat.reporting.BaseReporter):
+    """
+    NEAT reporter appending metrics of every generation to JSON lines file.
+
+    Arguments:
+    path: str
+        Telemetry file (appended, so resumed training continues in the same file)
+    stats_source: object
+        Fitness function owner with attribute game_stats (statistics of the last evaluated generation,
+        see Game.stats), e.g. HeadlessEvaluator or App
+    """
+
+    def __init__(self, path, stats_source):
+        self.path = path
+        self.stats_source = stats_source
+        self.generation = None
+        self.generation_start = None
+        self.evaluation_time = None
+        self.record = None
+        self.tick_stats = (None, None)
+
+        directory = os.path.dirname(path)
+        if directory != "":
+            os.makedirs(directory, exist_ok=True)
+
+    def start_generation(self, generation):
+        self.generation = generation
+        self.generation_start = time.perf_counter()
+
+    def post_evaluate(self, config, population, species, best_genome):
+        self.evaluation_time = time.perf_counter() - self.generation_start
+        fitness = np.array([genome.fitness for genome in population.values()], dtype=float)
+        counts, edges = np.histogram(fitness, bins=FITNESS_HISTOGRAM_BINS)
+        stats = getattr(self.stats_source, "game_stats", None) or {}
+
+        self.record = {"type": "generation",
+                       "generation": self.generation,
+                       "time": time.time(),
+                       "population": len(fitness),
+                       "fitness": {"min": float(fitness.min()), "max": float(fitness.max()),
+                                   "mean": float(fitness.mean()), "stdev": float(fitness.std()),
+                                   "p10": float(np.percentile(fitness, 10)), "p50": float(np.percentile(fitness, 50)),
+                                   "p90": float(np.percentile(fitness, 90))},
+                       "fitness_histogram": {"edges": edges.tolist(), "counts": counts.tolist()},
+                       "best_genome": best_genome.key,
+                       "evaluation_time_s": self.evaluation_time,
+                       "ticks": stats.get("ticks"),
+                       "ticks_per_second": stats["ticks"] / self.evaluation_time if "ticks" in stats and self.evaluation_time > 0 else None,
+                       "pillars": stats.get("pillars"),
+                       "deaths": stats.get("deaths")}
+        self.tick_stats = (stats.get("tick_alive"), stats.get("tick_best_score"))
+
+    def end_generation(self, config, population, species_set):
+        self.write_record(species_set)
+
+    # neat skips end_generation when the threshold is reached or the population dies out,
+    # the generation is written without species then
+
+    def found_solution(self, config, generation, best):
+        self.write_record()
+
+    def complete_extinction(self):
+        self.write_record()
+
+    def write_record(self, species_set = None):
+        if self.record == None:
+            return
+        self.record["wall_time_s"] = time.perf_counter() - self.generation_start
+        # species after reproduction, which will play the next generation
+        self.record["species"] = None if species_set == None else {"count": len(species_set.species),
+                                                                   "sizes": {str(key): len(s.members) for key, s in species_set.species.items()}}
+
+        lines = [json.dumps(self.record)]
+        alive, best_score = self.tick_stats
+        if alive != None:
+            lines.extend(json.dumps({"type": "tick", "generation": self.generation, "tick": tick, "alive": count, "best_score": score})
+                         for tick, (count, score) in enumerate(zip(alive, best_score)))
+        with open(self.path, "a") as f:
+            f.write("\n".join(lines) + "\n")
+        self.record = None
+
+
+def follow(path, poll_interval = 0.5):
+    # yields records of telemetry file, including the ones appended later (like tail -f),
+    # None is yielded when there is nothing new yet (or the file does not exist yet)
+    f = None
+    buffer = ""
+    try:
+        while True:
+            if f == None and os.path.exists(path):
+                f = open(path)
+            line = f.readline() if f != None else ""
+            if line == "":
+                yield None
+                time.sleep(poll_interval)
+                continue
+            buffer += line
+            if buffer.endswith("\n"): # line may be still being written
+                yield json.loads(buffer)
+                buffer = ""
+    finally:
+        if f != None:
+            f.close()
+
+
+class TelemetryPlot():
+    # Live plot of telemetry file in tkinter window - best, mean and 10th percentile of fitness per generation
+
+    def __init__(self, path, poll_interval_ms = 500):
+        import tkinter as tk
+        self.records = follow(path, poll_interval=0)
+        self.poll_interval_ms = poll_interval_ms
+        self.generations = []
+
+        self.root = tk.Tk()
+        self.root.title(f"Telemetry - {path}")
+        self.canvas = tk.Canvas(self.root, width=700, height=400, background="#000000")
+        self.canvas.pack(fill="both", expand=True)
+        self.label = tk.Label(self.root, text="waiting for data", font=("Courier", 9), justify="left")
+        self.label.pack()
+
+    def run(self):
+        self.poll()
+        self.root.mainloop()
+
+    def poll(self):
+        record = next(self.records)
+        while record != None:
+            if record["type"] == "generation":
+                self.generations.append(record)
+            record = next(self.records)
+        if len(self.generations) > 0:
+            self.draw()
+        self.root.after(self.poll_interval_ms, self.poll)
+
+    def draw(self):
+        canvas = self.canvas
+        canvas.delete("all")
+        width, height, margin = canvas.winfo_width(), canvas.winfo_height(), 30
+        series = {"max": "#ffd700", "mean": "#00bfff", "p10": "#ff4040"}
+        values = [record["fitness"][name] for record in self.generations for name in series]
+        low, high = min(values), max(values)
+        high = high if high > low else low + 1
+        n = max(1, len(self.generations) - 1)
+
+        for name, color in series.items():
+            points = []
+            for i, record in enumerate(self.generations):
+                points.append(margin + i / n * (width - 2 * margin))
+                points.append(height - margin - (record["fitness"][name] - low) / (high - low) * (height - 2 * margin))
+            if len(points) >= 4:
+                canvas.create_line(*points, fill=color, width=2)
+            canvas.create_text(width - margin, margin + 15 * list(series).index(name), text=name, fill=color, anchor="e")
+        canvas.create_text(margin, margin, text=f"{high:.2f}", fill="#999999", anchor="w")
+        canvas.create_text(margin, height - margin, text=f"{low:.2f}", fill="#999999", anchor="w")
+
+        last = self.generations[-1]
+        self.label.config(text=format_generation(last))
+
+
+def format_generation(record):
+    fitness = record["fitness"]
+    ticks_per_second = record.get("ticks_per_second")
+    text = (f"generation {record['generation']}: best {fitness['max']:.3f}  mean {fitness['mean']:.3f}  "
+            f"species {record['species']['count'] if record['species'] != None else '-'}  wall time {record['wall_time_s']:.2f} s")
+    if ticks_per_second != None:
+        text += f"  {ticks_per_second:.0f} ticks/s"
+    if record.get("deaths"):
+        text += "  deaths: " + ", ".join(f"{count} x {reason}" for reason, count in record["deaths"].items())
+    return text
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Follows telemetry file written during training (game.py --telemetry)")
+    parser.add_argument("telemetry", help="telemetry JSON lines file")
+    parser.add_argument("--text", action="store_true", help="print generations to terminal instead of plotting in window")
+    args = parser.parse_args()
+
+    if args.text:
+        for record in follow(args.telemetry):
+            if record != None and record["type"] == "generation":
+                print(format_generation(record), flush=True)
+    else:
+        TelemetryPlot(args.telemetry).run()
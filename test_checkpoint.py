@@ -0,0 +1,73 @@
+import os
+import random
+import neat
+from checkpoint import CheckpointStore
+
+
+CONFIG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "config.txt")
+
+
+def create_config():
+    config = neat.Config(neat.DefaultGenome, neat.DefaultReproduction,
+                         neat.DefaultSpeciesSet, neat.DefaultStagnation,
+                         CONFIG_PATH)
+    config.pop_size = 150
+    config.fitness_threshold = float("inf")
+    config.genome_config.node_add_prob = 0.5 # many hidden nodes, so node keys differ between genomes
+    return config
+
+
+def fitness_by_size(genomes, config):
+    # no game needed - bigger networks are preferred, so species keep genomes with many nodes
+    for genome_id, genome in genomes:
+        genome.fitness = len(genome.nodes) + random.random()
+
+
+def test_restored_population_continues_training(tmp_path):
+    random.seed(0)
+    population = neat.Population(create_config())
+    CheckpointStore(str(tmp_path), keep_last=20).attach(population)
+    population.run(fitness_by_size, 15)
+
+    # every resume is like a fresh process (new config), neat indexers start from nothing
+    for generation in range(3, 15, 3):
+        restored = CheckpointStore(str(tmp_path), keep_last=20).restore(create_config(), generation)
+        assert restored.generation == generation
+        restored.run(fitness_by_size, 3)
+        assert restored.generation == generation + 3
+
+
+def test_new_training_archives_previous_one(tmp_path):
+    random.seed(0)
+    population = neat.Population(create_config())
+    CheckpointStore(str(tmp_path)).attach(population)
+    population.run(fitness_by_size, 4)
+
+    population = neat.Population(create_config())
+    store = CheckpointStore(str(tmp_path))
+    store.attach(population)
+    population.run(fitness_by_size, 2)
+
+    assert [entry["generation"] for entry in store.index] == [1, 2]
+    assert CheckpointStore(str(tmp_path)).find("best") in (1, 2)
+    archived = [name for name in os.listdir(tmp_path) if name.startswith("run_")]
+    assert len(archived) == 1
+    assert CheckpointStore(os.path.join(tmp_path, archived[0])).find("latest") == 4
+
+
+def test_resume_from_older_snapshot_archives_newer_ones(tmp_path):
+    random.seed(0)
+    population = neat.Population(create_config())
+    CheckpointStore(str(tmp_path), keep_last=20, full_every=3).attach(population)
+    population.run(fitness_by_size, 8)
+
+    store = CheckpointStore(str(tmp_path), keep_last=20, full_every=3)
+    store.restore(create_config(), 5)
+    assert [entry["generation"] for entry in store.index] == [1, 2, 3, 4, 5]
+
+    # abandoned snapshots keep their fitness history and can still be restored (with snapshots their deltas need)
+    archived = [name for name in os.listdir(tmp_path) if name.startswith("run_")]
+    assert len(archived) == 1
+    archive = CheckpointStore(os.path.join(tmp_path, archived[0]))
+    assert [entry["best_fitness"] != None for entry in archive.index if entry["generation"] > 5] == [True, True, True]
+    assert archive.restore(create_config(), 8).generation == 8
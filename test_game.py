@@ -0,0 +1,28 @@
+import os
+import neat
+from game import Game, ENGINE_INTERVAL_MS
+
+
+CONFIG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "config.txt")
+
+
+def create_game(size = 10, seed = 0):
+    config = neat.Config(neat.DefaultGenome, neat.DefaultReproduction,
+                         neat.DefaultSpeciesSet, neat.DefaultStagnation,
+                         CONFIG_PATH)
+    genomes = []
+    for genome_id in range(size):
+        genome = config.genome_type(genome_id)
+        genome.configure_new(config.genome_config)
+        genomes.append((genome_id, genome))
+    return Game(ENGINE_INTERVAL_MS, genomes, config, seed=seed)
+
+
+def test_lookahead_pillars_are_ahead_of_each_other():
+    game = create_game()
+    # only pillars move, birds are not needed (they would die within the first pillars)
+    for tick in range(5000):
+        game.physics_move_all_pillars()
+        game.order_pillars()
+        x = [pillar.center_position[0] for pillar in game.track.lookahead(2)]
+        assert x[0] < x[1], f"tick {tick}: lookahead x positions {x}"
@@ -0,0 +1,57 @@
+import os
+import random
+import neat
+import numpy as np
+from network import ACTIVATION_NAMES, CompiledNetwork, PopulationNetwork
+
+
+CONFIG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "config.txt")
+
+
+def create_networks(size = 300, mutations = 30, seed = 0):
+    # heavily mutated genomes with all supported activations, so networks differ in depth, width and activations
+    config = neat.Config(neat.DefaultGenome, neat.DefaultReproduction,
+                         neat.DefaultSpeciesSet, neat.DefaultStagnation,
+                         CONFIG_PATH)
+    config.genome_config.activation_options = ACTIVATION_NAMES
+    config.genome_config.activation_mutate_rate = 0.5
+    config.genome_config.node_add_prob = 0.5
+    config.genome_config.node_delete_prob = 0.05
+    config.genome_config.conn_delete_prob = 0.1
+    random.seed(seed)
+    networks = []
+    for genome_id in range(size):
+        genome = config.genome_type(genome_id)
+        genome.configure_new(config.genome_config)
+        for i in range(random.randrange(mutations)):
+            genome.mutate(config.genome_config)
+        networks.append(neat.nn.FeedForwardNetwork.create(genome, config))
+    return networks
+
+
+def neat_outputs(networks, inputs):
+    return np.array([net.activate(row.tolist()) for net, row in zip(networks, inputs)])
+
+
+def test_compiled_network_matches_neat():
+    networks = create_networks()
+    inputs = np.random.default_rng(0).uniform(-1, 2, size=(20, len(networks[0].input_nodes)))
+    for net in networks:
+        expected = np.array([net.activate(row.tolist()) for row in inputs])
+        assert np.allclose(CompiledNetwork.create(net).activate(inputs), expected, rtol=1e-12, atol=1e-12)
+
+
+def test_population_network_matches_neat():
+    networks = create_networks()
+    population = PopulationNetwork.create(networks)
+    rng = np.random.default_rng(1)
+    inputs = rng.uniform(-1, 2, size=(len(networks), population.num_inputs))
+    assert np.allclose(population.activate(inputs), neat_outputs(networks, inputs), rtol=1e-12, atol=1e-12)
+
+    # dead birds are dropped in batches, the rest keeps its own network
+    for i in range(3):
+        survivors = np.sort(rng.choice(len(population), size=len(population) // 2, replace=False))
+        population.keep_only(survivors)
+        networks = [networks[index] for index in survivors]
+        inputs = rng.uniform(-1, 2, size=(len(networks), population.num_inputs))
+        assert np.allclose(population.activate(inputs), neat_outputs(networks, inputs), rtol=1e-12, atol=1e-12)
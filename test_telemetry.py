@@ -0,0 +1,47 @@
+import os
+import json
+import random
+import neat
+from telemetry import TelemetryReporter
+
+
+CONFIG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "config.txt")
+
+
+class FakeEvaluator():
+    # fitness function with game statistics, like HeadlessEvaluator
+
+    def __init__(self):
+        self.game_stats = None
+
+    def evaluate(self, genomes, config):
+        for genome_id, genome in genomes:
+            genome.fitness = random.random()
+        self.game_stats = {"ticks": 100, "pillars": 1, "deaths": {"floor": len(genomes)}}
+
+
+def read_generations(path):
+    with open(path) as f:
+        return [record for record in map(json.loads, f) if record["type"] == "generation"]
+
+
+def test_generation_reaching_threshold_is_written(tmp_path):
+    config = neat.Config(neat.DefaultGenome, neat.DefaultReproduction,
+                         neat.DefaultSpeciesSet, neat.DefaultStagnation,
+                         CONFIG_PATH)
+    path = str(tmp_path / "telemetry.jsonl")
+    evaluator = FakeEvaluator()
+
+    random.seed(0)
+    config.fitness_threshold = 2 # not reachable
+    population = neat.Population(config)
+    population.add_reporter(TelemetryReporter(path, evaluator))
+    population.run(evaluator.evaluate, 2)
+    assert [record["species"] != None for record in read_generations(path)] == [True, True]
+
+    # neat stops right after evaluation, without end_generation
+    config.fitness_threshold = 0
+    population.run(evaluator.evaluate, 5)
+    records = read_generations(path)
+    assert [record["generation"] for record in records] == [0, 1, 2]
+    assert records[-1]["species"] == None